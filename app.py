@@ -1,61 +1,158 @@
-from flask import Flask, render_template, request, jsonify, send_file, send_from_directory
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, Response, g, has_request_context, make_response, render_template, request, jsonify, send_file
 import os
 import uuid
 import asyncio
-from datetime import datetime
+from datetime import datetime, timezone
 import base64
+import gzip
+import io
 import json
+import re
 import tempfile
 import logging
+import hashlib
+import threading
+import queue
+import atexit
+import zipfile
+import math
+import shutil
+import sys
+import sqlite3
+import functools
+import importlib
+import importlib.util
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.utils import secure_filename
 
 load_dotenv()
 
-# ------------------ TTS Libraries ------------------
 try:
-    import edge_tts
-    EDGE_AVAILABLE = True
-    print("✅ edge-tts available")
+    import fcntl  # POSIX only; cross-process locks become no-ops without it
 except ImportError:
-    EDGE_AVAILABLE = False
-    print("❌ edge-tts not available")
+    fcntl = None
 
-try:
-    from gtts import gTTS
-    GTTS_AVAILABLE = True
+# ------------------ TTS Libraries ------------------
+# Engines are only located here; they are imported on first use so a serverless cold start
+# for /, /stats or /sitemap.xml doesn't pay for aiohttp, gTTS/requests or pyttsx3.
+_lazy_modules = {}
+_lazy_lock = threading.Lock()
+LAZY_IMPORT_SECONDS = {}
+
+
+def lazy_import(name):
+    """Import a module once, thread-safely, on first use; None if the import fails"""
+    if name in _lazy_modules:
+        return _lazy_modules[name]
+    with _lazy_lock:
+        if name not in _lazy_modules:
+            started = time.perf_counter()
+            try:
+                module = importlib.import_module(name)
+            except Exception as e:
+                logging.error(f"❌ {name} failed to import: {e}")
+                module = None
+            LAZY_IMPORT_SECONDS[name] = time.perf_counter() - started
+            logging.info(f"📦 Loaded {name} in {LAZY_IMPORT_SECONDS[name] * 1000:.0f} ms")
+            _lazy_modules[name] = module
+    return _lazy_modules[name]
+
+
+def _installed(name):
+    return importlib.util.find_spec(name) is not None
+
+
+EDGE_AVAILABLE = _installed("edge_tts")
+print("✅ edge-tts available" if EDGE_AVAILABLE else "❌ edge-tts not available")
+
+GTTS_AVAILABLE = _installed("gtts")
+if GTTS_AVAILABLE:
     print("✅ gTTS available")
-except ImportError:
-    GTTS_AVAILABLE = False
 
-try:
-    import pyttsx3
-    PYTTSX3_AVAILABLE = True
+PYTTSX3_AVAILABLE = _installed("pyttsx3")
+if PYTTSX3_AVAILABLE:
     print("✅ pyttsx3 available")
-except ImportError:
-    PYTTSX3_AVAILABLE = False
 
 # ------------------ Redis ------------------
-try:
-    from upstash_redis import Redis
-    redis = Redis(
-        url=os.getenv("KV_REST_API_URL"),
-        token=os.getenv("KV_REST_API_TOKEN")
-    )
-    redis.ping()
-    REDIS_AVAILABLE = True
-    print("✅ Connected to Upstash Redis")
-except Exception as e:
-    print(f"❌ Redis not available: {e}")
-    redis = None
-    REDIS_AVAILABLE = False
+REDIS_URL = os.getenv("KV_REST_API_URL")
+REDIS_TOKEN = os.getenv("KV_REST_API_TOKEN")
+REDIS_RETRY_SECONDS = float(os.getenv("REDIS_RETRY_SECONDS", "60"))
+_redis_client = None
+_redis_failed_at = None
+_redis_lock = threading.Lock()
+
+
+def redis_configured():
+    """Cheap check for code on the request path that must not wait for a connection"""
+    return bool(REDIS_URL and REDIS_TOKEN)
+
+
+def get_redis():
+    """Connect to Upstash on first use; None while unconfigured or unreachable (retried later)"""
+    global _redis_client, _redis_failed_at
+    if _redis_client is not None or not redis_configured():
+        return _redis_client
+    with _redis_lock:
+        if _redis_client is not None:
+            return _redis_client
+        if _redis_failed_at is not None and time.monotonic() - _redis_failed_at < REDIS_RETRY_SECONDS:
+            return None
+        started = time.perf_counter()
+        try:
+            from upstash_redis import Redis
+            client = Redis(url=REDIS_URL, token=REDIS_TOKEN)
+            client.ping()
+            _redis_client = client
+            logging.info(f"✅ Connected to Upstash Redis in {(time.perf_counter() - started) * 1000:.0f} ms")
+        except Exception as e:
+            _redis_failed_at = time.monotonic()
+            logging.error(f"❌ Redis not available: {e}")
+    return _redis_client
 
 # ------------------ Flask App ------------------
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Number of reverse proxies in front of the app; only their X-Forwarded-For hops are trusted
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", "0"))
+if TRUSTED_PROXY_COUNT:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT, x_proto=TRUSTED_PROXY_COUNT)
+
 TEMP_FOLDER = tempfile.gettempdir()
 os.makedirs(TEMP_FOLDER, exist_ok=True)
 
+MAX_TEXT_CHARS = int(os.getenv("MAX_TEXT_CHARS", "50000"))
+
+# Serverless instances are per-request and short-lived: no background warm-up work by default
+SERVERLESS = bool(os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+BACKGROUND_DEFAULT = "0" if SERVERLESS else "1"
+
+
+@contextmanager
+def process_lock(name):
+    """Non-blocking lock shared by every worker process on this box; yields False if another holds it"""
+    if fcntl is None:
+        yield True
+        return
+    with open(os.path.join(TEMP_FOLDER, f"voicepro_{name}.lock"), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
 # ------------------ Voice Mapping (language, voice_type) -> edge-tts voice name ------------------
 VOICE_MAPPING = {
     # English USA
@@ -307,6 +404,9 @@ def get_voice(lang, voice_type):
     voice = VOICE_MAPPING.get((lang, voice_type))
     if voice:
         return voice
+    # Any Edge voice from the catalog, by its short name (e.g. "fr-CA-SylvieNeural")
+    if voice_catalog.get(voice_type):
+        return voice_type
     # Try female-1 as default for that language
     voice = VOICE_MAPPING.get((lang, 'female-1'))
     if voice:
@@ -355,27 +455,2356 @@ def build_volume_str(volume_val):
         return "+0%"
 
 
+# Edge's public endpoint rejects custom SSML (mstts:express-as), so speaking styles are
+# approximated with prosody: rate multiplier, pitch steps and volume offset.
+STYLE_PROSODY = {
+    "general":   (1.0, 0, 0),
+    "cheerful":  (1.08, 2, 0),
+    "sad":       (0.88, -2, -10),
+    "angry":     (1.1, 1, 10),
+    "excited":   (1.15, 3, 5),
+    "friendly":  (1.02, 1, 0),
+    "newscast":  (1.05, -1, 0),
+    "assistant": (1.0, 0, 0),
+}
+
+
+def apply_style(style, rate, pitch, volume):
+    """Fold a speaking style into the numeric rate/pitch/volume controls"""
+    rate_mul, pitch_add, volume_add = STYLE_PROSODY.get((style or "general").lower(), STYLE_PROSODY["general"])
+    if rate_mul == 1.0 and not pitch_add and not volume_add:
+        return rate, pitch, volume
+    try:
+        rate = round(min(max(float(rate) * rate_mul, 0.5), 2.0), 2)
+        pitch = int(float(pitch)) + pitch_add
+        volume = int(float(volume)) + volume_add
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return rate, pitch, volume
+
+
+# ------------------ Metrics & Tracing ------------------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(names, values, extra=""):
+    pairs = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Minimal labelled histogram rendered in the Prometheus text format"""
+
+    def __init__(self, name, help_text, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [cumulative bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._series.items())
+        for key, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts + [count]):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {bucket_count}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "voicepro_stage_seconds", "Time spent in each synthesis stage",
+    ("stage", "engine", "language", "voice"))
+REQUEST_SECONDS = Histogram(
+    "voicepro_request_seconds", "End-to-end request latency",
+    ("endpoint", "method", "status"))
+
+
+KNOWN_LANGUAGE_CODES = {l["code"] for l in LANGUAGES}
+KNOWN_VOICE_NAMES = set(VOICE_MAPPING.values())
+
+
+def language_label(lang):
+    """Bound the label set: language comes straight from the form"""
+    return lang if not lang or lang in KNOWN_LANGUAGE_CODES else "other"
+
+
+def voice_label(voice):
+    if not voice or voice in KNOWN_VOICE_NAMES:
+        return voice
+    # Catalog voices are a bounded set too; anything else is collapsed
+    catalog = globals().get("voice_catalog")
+    return voice if catalog is not None and catalog.get(voice) else "other"
+
+
+@contextmanager
+def trace_stage(stage, engine="", language="", voice=""):
+    """Time a block into the stage histogram and this request's Server-Timing header"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage, engine=engine,
+                              language=language_label(language), voice=voice_label(voice))
+        if has_request_context():
+            g.setdefault("stage_timings", []).append((f"{stage}-{engine}" if engine else stage, elapsed))
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def finish_request_timer(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    REQUEST_SECONDS.observe(elapsed, endpoint=request.endpoint or "unmatched",
+                            method=request.method, status=response.status_code)
+    timings = g.get("stage_timings", [])
+    if timings:
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings]
+        entries.append(f"total;dur={elapsed * 1000:.1f}")
+        response.headers["Server-Timing"] = ", ".join(entries)
+    return response
+
+
+# ------------------ Audio Cache ------------------
+AUDIO_CACHE_DIR = os.path.join(TEMP_FOLDER, "voicepro_cache")
+AUDIO_CACHE_MAX_ITEMS = int(os.getenv("AUDIO_CACHE_MAX_ITEMS", "128"))
+AUDIO_CACHE_MAX_MEMORY_BYTES = int(os.getenv("AUDIO_CACHE_MAX_MEMORY_BYTES", str(32 * 1024 * 1024)))
+AUDIO_CACHE_MAX_DISK_BYTES = int(os.getenv("AUDIO_CACHE_MAX_DISK_BYTES", str(256 * 1024 * 1024)))
+AUDIO_CACHE_TTL = int(os.getenv("AUDIO_CACHE_TTL", str(7 * 24 * 3600)))
+# Other worker processes write to the same folder, so the tracked size is re-measured periodically
+AUDIO_CACHE_RESCAN_SECONDS = int(os.getenv("AUDIO_CACHE_RESCAN_SECONDS", "300"))
+
+
+def audio_cache_key(text, voice, rate_str, pitch_str, volume_str):
+    """Content hash of the normalized synthesis inputs"""
+    raw = "\x1f".join([text, voice, rate_str, pitch_str, volume_str])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class AudioCache:
+    """Two-tier audio cache: bounded in-process LRU in front of a TTL'd disk folder"""
+
+    def __init__(self, folder, max_items, max_memory_bytes, max_disk_bytes, ttl):
+        self.folder = folder
+        self.max_items = max_items
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()  # key -> (audio bytes, meta dict, stored_at)
+        self._memory_bytes = 0
+        self._disk_bytes = None  # lazily measured, then tracked incrementally
+        self._measured_at = 0.0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        try:
+            os.makedirs(folder, exist_ok=True)
+            self.disk_enabled = True
+        except OSError as e:
+            logging.warning(f"Audio cache disk tier disabled: {e}")
+            self.disk_enabled = False
+
+    def _paths(self, key):
+        base = os.path.join(self.folder, key)
+        return base + ".mp3", base + ".json"
+
+    def _remember(self, key, data, meta, stored_at):
+        # Caller must hold the lock
+        old = self._memory.pop(key, None)
+        if old:
+            self._memory_bytes -= len(old[0])
+        if len(data) > self.max_memory_bytes:
+            return
+        self._memory[key] = (data, meta, stored_at)
+        self._memory_bytes += len(data)
+        while self._memory and (len(self._memory) > self.max_items or self._memory_bytes > self.max_memory_bytes):
+            _, (evicted, _, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def get(self, key):
+        """Return (audio bytes, meta) or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[2] < self.ttl:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0], entry[1]
+            if entry:
+                self._memory_bytes -= len(self._memory.pop(key)[0])
+
+        if self.disk_enabled:
+            audio_path, meta_path = self._paths(key)
+            try:
+                stored_at = os.path.getmtime(audio_path)
+                if now - stored_at < self.ttl:
+                    with open(audio_path, "rb") as f:
+                        data = f.read()
+                    meta = {}
+                    try:
+                        with open(meta_path, "r", encoding="utf-8") as f:
+                            meta = json.load(f)
+                    except (OSError, ValueError):
+                        pass
+                    os.utime(audio_path, None)  # refresh recency for disk eviction
+                    with self._lock:
+                        self._remember(key, data, meta, now)
+                        self.disk_hits += 1
+                    return data, meta
+                self._remove_files(key)
+            except OSError:
+                pass
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data, meta=None):
+        meta = meta or {}
+        with self._lock:
+            self._remember(key, data, meta, time.time())
+        if not self.disk_enabled:
+            return
+        audio_path, meta_path = self._paths(key)
+        try:
+            # Write-then-rename so concurrent readers never see a partial file
+            tmp_path = f"{audio_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, audio_path)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        except OSError as e:
+            logging.error(f"Audio cache write error: {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data)
+            needs_sweep = (self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+                           or time.monotonic() - self._measured_at > AUDIO_CACHE_RESCAN_SECONDS)
+        if needs_sweep:
+            self._evict_disk()
+
+    def _remove_files(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict_disk(self):
+        """Drop expired entries, then least recently used ones until under the size budget"""
+        now = time.time()
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".mp3"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.folder, name))
+            except OSError:
+                continue
+            key = name[:-4]
+            if now - st.st_mtime >= self.ttl:
+                self._remove_files(key)
+                continue
+            entries.append((st.st_mtime, st.st_size, key))
+            total += st.st_size
+
+        if total > self.max_disk_bytes:
+            target = int(self.max_disk_bytes * 0.9)
+            for _, size, key in sorted(entries):
+                if total <= target:
+                    break
+                self._remove_files(key)
+                total -= size
+
+        with self._lock:
+            self._disk_bytes = total
+            self._measured_at = time.monotonic()
+
+    def get_meta(self, key):
+        """Metadata stored with an entry (format, method, ...), or {}"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                return entry[1]
+        if self.disk_enabled:
+            try:
+                with open(self._paths(key)[1], "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {}
+
+    def get_path(self, key):
+        """Path of a fresh on-disk entry (for sendfile), or None"""
+        if not self.disk_enabled:
+            return None
+        audio_path, _ = self._paths(key)
+        try:
+            if time.time() - os.path.getmtime(audio_path) < self.ttl:
+                return audio_path
+        except OSError:
+            pass
+        return None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "disk_enabled": self.disk_enabled,
+            }
+
+
+AUDIO_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+
+audio_cache = AudioCache(
+    AUDIO_CACHE_DIR,
+    max_items=AUDIO_CACHE_MAX_ITEMS,
+    max_memory_bytes=AUDIO_CACHE_MAX_MEMORY_BYTES,
+    max_disk_bytes=AUDIO_CACHE_MAX_DISK_BYTES,
+    ttl=AUDIO_CACHE_TTL,
+)
+
+
+# ------------------ Async Worker Loop ------------------
+EDGE_DNS_CACHE_TTL = int(os.getenv("EDGE_DNS_CACHE_TTL", "300"))
+
+_shared_connector_class = None
+
+
+def make_shared_connector(**kwargs):
+    """Build the shared connector; the class is defined on first use so aiohttp loads lazily"""
+    global _shared_connector_class
+    if _shared_connector_class is None:
+        aiohttp = lazy_import("aiohttp")
+
+        class SharedTCPConnector(aiohttp.TCPConnector):
+            """Connector that outlives the per-call ClientSession edge-tts opens and closes"""
+
+            async def close(self, *, abort_ssl=False):
+                # edge-tts closes its session after every call; keep our pool alive
+                pass
+
+            async def shutdown(self):
+                await super().close()
+
+        _shared_connector_class = SharedTCPConnector
+    return _shared_connector_class(**kwargs)
+
+
+class AsyncLoopWorker:
+    """One long-lived event loop on a daemon thread; Flask handlers submit coroutines to it"""
+
+    def __init__(self, name="tts-loop"):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._connector = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        with self._lock:
+            # A dead thread also covers the child side of a fork: start a fresh loop there
+            if self._thread is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._connector = None
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro):
+        """Schedule a coroutine on the worker loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the worker loop and block until it finishes"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def connector(self):
+        """Shared connection pool + DNS cache; only call from coroutines on this loop"""
+        if not EDGE_AVAILABLE:
+            return None
+        if self._connector is None or self._connector.closed:
+            self._connector = make_shared_connector(ttl_dns_cache=EDGE_DNS_CACHE_TTL, limit=0)
+        return self._connector
+
+    def stop(self):
+        with self._lock:
+            loop, thread, connector = self._loop, self._thread, self._connector
+            self._thread = None
+        if not thread or not thread.is_alive():
+            return
+        if connector is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(connector.shutdown(), loop).result(5)
+            except Exception:
+                pass
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+
+
+loop_worker = AsyncLoopWorker()
+atexit.register(loop_worker.stop)
+
+
+def run_async(coro, timeout=None):
+    return loop_worker.run(coro, timeout)
+
+
+# ------------------ Long-Text Segmented Synthesis ------------------
+SEGMENT_MAX_CHARS = int(os.getenv("SEGMENT_MAX_CHARS", "1500"))
+SEGMENT_CONCURRENCY = int(os.getenv("SEGMENT_CONCURRENCY", "4"))
+SEGMENT_RETRIES = int(os.getenv("SEGMENT_RETRIES", "2"))
+# Texts longer than this render segment by segment, each segment cached on its own
+INCREMENTAL_MIN_CHARS = int(os.getenv("INCREMENTAL_MIN_CHARS", "600"))
+# A segment may end after roughly one sentence in SEGMENT_ANCHOR_EVERY (chosen by content hash)
+SEGMENT_ANCHOR_EVERY = int(os.getenv("SEGMENT_ANCHOR_EVERY", "4"))
+
+# Latin-style full stops only end a sentence before whitespace ("3.14", "e.g.x" stay intact);
+# CJK, Devanagari (danda) and Arabic terminators end one unconditionally.
+SENTENCE_END_RE = re.compile(r'[.!?…]+["\'”’)\]]*(?=\s|$)|[。！？｡।॥؟۔]+["\'”’」』)）]*|\n+')
+CLAUSE_END_RE = re.compile(r'[,;:，、；：،]+\s*')
+WHITESPACE_RE = re.compile(r'\s+')
+# Scripts without spaces between words pack far more speech into each character
+DENSE_SCRIPT_RE = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]')
+
+
+def _split_after(pattern, text):
+    pieces = []
+    start = 0
+    for m in pattern.finditer(text):
+        if m.end() > start:
+            pieces.append(text[start:m.end()])
+            start = m.end()
+    if start < len(text):
+        pieces.append(text[start:])
+    return pieces
+
+
+def split_sentences(text):
+    return _split_after(SENTENCE_END_RE, text)
+
+
+def _fit_piece(piece, limit):
+    """Break one over-long sentence at clause, then word, then hard boundaries"""
+    if len(piece) <= limit:
+        return [piece]
+    for pattern in (CLAUSE_END_RE, WHITESPACE_RE):
+        parts = _split_after(pattern, piece)
+        if len(parts) > 1:
+            fitted = []
+            for part in parts:
+                fitted.extend(_fit_piece(part, limit))
+            return fitted
+    return [piece[i:i + limit] for i in range(0, len(piece), limit)]
+
+
+def _is_anchor(sentence):
+    """Content-defined boundary, so an edit only moves the segments around it"""
+    digest = hashlib.blake2b(sentence.strip().encode('utf-8'), digest_size=4).digest()
+    return int.from_bytes(digest, 'big') % SEGMENT_ANCHOR_EVERY == 0
+
+
+def segment_text(text, max_chars=None):
+    """Split text into synthesis-sized segments at sentence/punctuation boundaries"""
+    limit = max_chars or SEGMENT_MAX_CHARS
+    if len(DENSE_SCRIPT_RE.findall(text)) > len(text) * 0.3:
+        limit = max(limit // 2, 1)
+
+    segments = []
+    current = ""
+    for sentence in split_sentences(text):
+        for piece in _fit_piece(sentence, limit):
+            if current.strip() and len(current) + len(piece) > limit:
+                segments.append(current.strip())
+                current = ""
+            current += piece
+        # Ending segments on anchor sentences (not just on size) keeps boundaries stable
+        # across edits: text after the next anchor segments exactly as it did before.
+        # The minimum size keeps this from turning into one Edge call per few sentences.
+        if len(current.strip()) >= limit // 4 and sentence.strip() and _is_anchor(sentence):
+            segments.append(current.strip())
+            current = ""
+    if current.strip():
+        segments.append(current.strip())
+    return segments
+
+
+def strip_id3(data):
+    """Drop ID3v2 header / ID3v1 trailer so MP3 streams can be joined frame to frame"""
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] & 0x7f) << 21 | (data[7] & 0x7f) << 14 | (data[8] & 0x7f) << 7 | (data[9] & 0x7f)
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+def concat_mp3(parts):
+    """Concatenate MP3 streams at frame level (no decode/re-encode)"""
+    return b"".join(strip_id3(p) for p in parts)
+
+
+async def edge_render(text, voice, rate_str="+0%", pitch_str="+0Hz", volume_str="+0%"):
+    """Render text with edge-tts straight into memory"""
+    audio = bytearray()
+    communicate = lazy_import("edge_tts").Communicate(
+        text=text,
+        voice=voice,
+        rate=rate_str,
+        pitch=pitch_str,
+        volume=volume_str,
+        connector=loop_worker.connector()
+    )
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            audio.extend(chunk["data"])
+    return bytes(audio)
+
+
+async def _render_segment(sem, index, text, voice, rate_str, pitch_str, volume_str):
+    async with sem:
+        for attempt in range(SEGMENT_RETRIES + 1):
+            try:
+                audio = await edge_render(text, voice, rate_str, pitch_str, volume_str)
+                if not audio:
+                    raise RuntimeError("no audio received")
+                return audio
+            except Exception as e:
+                if attempt == SEGMENT_RETRIES:
+                    raise
+                logging.warning(f"Segment {index} failed (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(0.5 * (attempt + 1))
+
+
+async def render_segments(segments, voice, rate_str, pitch_str, volume_str):
+    """Render segments concurrently on the worker loop; failed segments come back as exceptions"""
+    sem = asyncio.Semaphore(SEGMENT_CONCURRENCY)
+    return await asyncio.gather(*(
+        _render_segment(sem, i, seg, voice, rate_str, pitch_str, volume_str)
+        for i, seg in enumerate(segments)
+    ), return_exceptions=True)
+
+
+def synthesize_segmented(text, voice, rate_str, pitch_str, volume_str, timeout):
+    """Join per-segment renders, synthesizing only segments missing from the audio cache"""
+    segments = segment_text(text)
+    keys = [audio_cache_key(seg, voice, rate_str, pitch_str, volume_str) for seg in segments]
+    parts = []
+    for key in keys:
+        cached = audio_cache.get(key)
+        # Only Edge MP3 joins cleanly with other Edge segments
+        parts.append(cached[0] if cached and cached[1].get("method", "Edge TTS") == "Edge TTS"
+                     and cached[1].get("format", "mp3") == "mp3" else None)
+
+    missing = [i for i, part in enumerate(parts) if part is None]
+    if missing:
+        # Segments run SEGMENT_CONCURRENCY at a time; budget one timeout per wave
+        waves = math.ceil(len(missing) / SEGMENT_CONCURRENCY)
+        rendered = run_async(
+            render_segments([segments[i] for i in missing], voice, rate_str, pitch_str, volume_str),
+            timeout=timeout * waves
+        )
+        errors = []
+        for i, audio in zip(missing, rendered):
+            if isinstance(audio, BaseException):
+                errors.append(audio)
+                continue
+            parts[i] = audio
+            # Cached even if a sibling failed, so the retry only redoes the failures
+            audio_cache.put(keys[i], audio, {"method": "Edge TTS", "voice": voice, "format": "mp3"})
+        if errors:
+            raise errors[0]
+
+    logging.info(f"✅ Segmented render: {len(missing)}/{len(segments)} segments synthesized, voice={voice}")
+    return concat_mp3(parts)
+
+
+# ------------------ Voice Preview Bank ------------------
+PREVIEW_BANK_DIR = os.path.join(TEMP_FOLDER, "voicepro_previews")
+PREVIEW_WARM_ON_STARTUP = os.getenv("PREVIEW_WARM_ON_STARTUP", BACKGROUND_DEFAULT) == "1"
+PREVIEW_WARM_CONCURRENCY = int(os.getenv("PREVIEW_WARM_CONCURRENCY", "4"))
+PREVIEW_MAX_AGE = int(os.getenv("PREVIEW_MAX_AGE", str(7 * 24 * 3600)))
+# In-memory tier only; any catalog voice can be previewed, so the rest stay on disk
+PREVIEW_MEMORY_MAX_ITEMS = int(os.getenv("PREVIEW_MEMORY_MAX_ITEMS", "256"))
+
+
+class PreviewBank:
+    """Pre-rendered previews, one MP3 per distinct (edge voice, sample text)"""
+
+    def __init__(self, folder, max_items):
+        self.folder = folder
+        self.max_items = max_items
+        self._entries = OrderedDict()  # file id -> (audio bytes, etag), least recently used first
+        self._lock = threading.Lock()
+        self.warming = False
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def preview_for(lang, voice_type):
+        """Resolve a (lang, voice_type) pair to (file id, edge voice, sample text)"""
+        voice = get_voice(lang, voice_type)
+        text = SAMPLE_TEXTS.get(lang, "Hello! This is a preview of my voice.")
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:10]
+        return f"{voice}_{digest}", voice, text
+
+    def distinct_previews(self):
+        previews = {}
+        for lang, voice_type in VOICE_MAPPING:
+            file_id, voice, text = self.preview_for(lang, voice_type)
+            previews.setdefault(file_id, (voice, text))
+        return previews
+
+    def _path(self, file_id):
+        return os.path.join(self.folder, f"{file_id}.mp3")
+
+    def _load(self, file_id):
+        with self._lock:
+            entry = self._entries.get(file_id)
+            if entry:
+                self._entries.move_to_end(file_id)
+                return entry
+        try:
+            with open(self._path(file_id), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        return self._remember(file_id, data)
+
+    def _remember(self, file_id, data):
+        entry = (data, hashlib.md5(data).hexdigest())
+        with self._lock:
+            self._entries[file_id] = entry
+            self._entries.move_to_end(file_id)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _store(self, file_id, data):
+        tmp_path = f"{self._path(file_id)}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(file_id))
+        except OSError as e:
+            logging.error(f"Preview bank write error: {e}")
+        return self._remember(file_id, data)
+
+    @staticmethod
+    async def _render(voice, text):
+        audio = await edge_render(text, voice)
+        if len(audio) < 500:
+            raise RuntimeError(f"Preview render for {voice} returned no audio")
+        return audio
+
+    def banked(self, lang, voice_type):
+        """Return (audio bytes, etag) if the preview is already in the bank, without rendering"""
+        return self._load(self.preview_for(lang, voice_type)[0])
+
+    def get(self, lang, voice_type):
+        """Return (audio bytes, etag), rendering into the bank on a cold miss"""
+        file_id, voice, text = self.preview_for(lang, voice_type)
+        entry = self._load(file_id)
+        if entry:
+            return entry
+        if not EDGE_AVAILABLE:
+            return None
+        data = run_async(self._render(voice, text))
+        return self._store(file_id, data)
+
+    def warm(self):
+        """Render every missing preview; returns (rendered, already present, failed)"""
+        if not EDGE_AVAILABLE:
+            logging.warning("Preview warm-up skipped: edge-tts not installed")
+            return 0, 0, 0
+        previews = self.distinct_previews()
+        missing = {fid: vt for fid, vt in previews.items() if not self._load(fid)}
+        present = len(previews) - len(missing)
+        results = {"rendered": 0, "failed": 0}
+
+        async def warm_all():
+            sem = asyncio.Semaphore(PREVIEW_WARM_CONCURRENCY)
+
+            async def warm_one(file_id, voice, text):
+                async with sem:
+                    try:
+                        self._store(file_id, await self._render(voice, text))
+                        results["rendered"] += 1
+                    except Exception as e:
+                        results["failed"] += 1
+                        logging.error(f"Preview warm error ({voice}): {e}")
+
+            await asyncio.gather(*(warm_one(fid, v, t) for fid, (v, t) in missing.items()))
+
+        self.warming = True
+        try:
+            if missing:
+                run_async(warm_all())
+        finally:
+            self.warming = False
+        logging.info(f"🎧 Preview bank: {results['rendered']} rendered, {present} cached, {results['failed']} failed")
+        return results["rendered"], present, results["failed"]
+
+    def warm_once(self):
+        """Warm from one worker process only; the others read the shared bank from disk"""
+        with process_lock("preview-warm") as acquired:
+            if acquired:
+                return self.warm()
+            logging.info("🎧 Preview bank is being warmed by another worker")
+            return 0, 0, 0
+
+    def start_background_warm(self):
+        thread = threading.Thread(target=self.warm_once, name="preview-warm", daemon=True)
+        thread.start()
+        return thread
+
+
+preview_bank = PreviewBank(PREVIEW_BANK_DIR, PREVIEW_MEMORY_MAX_ITEMS)
+if PREVIEW_WARM_ON_STARTUP:
+    preview_bank.start_background_warm()
+
+
+# ------------------ Voice Catalog ------------------
+VOICE_CATALOG_PATH = os.path.join(TEMP_FOLDER, "voicepro_voices.json")
+VOICE_CATALOG_MAX_AGE = int(os.getenv("VOICE_CATALOG_MAX_AGE", str(24 * 3600)))
+VOICE_CATALOG_REFRESH_ON_STARTUP = os.getenv("VOICE_CATALOG_REFRESH_ON_STARTUP", BACKGROUND_DEFAULT) == "1"
+VOICE_CATALOG_TIMEOUT = float(os.getenv("VOICE_CATALOG_TIMEOUT", "15"))
+
+
+def bundled_voice_snapshot():
+    """Offline catalog: the curated voices from VOICE_MAPPING, genders taken from their voice types"""
+    genders = {}
+    for (lang, voice_type), voice in VOICE_MAPPING.items():
+        if voice_type.startswith(("female", "male")):
+            genders.setdefault(voice, "Female" if voice_type.startswith("female") else "Male")
+    return [
+        {"name": voice, "locale": lang, "gender": genders.get(voice, ""), "categories": [], "personalities": []}
+        for voice, lang in sorted({(v, l) for (l, _), v in VOICE_MAPPING.items()})
+    ]
+
+
+def compact_voice(entry):
+    """Keep only the list_voices() fields we serve or index"""
+    tag = entry.get("VoiceTag") or {}
+    return {
+        "name": entry["ShortName"],
+        "locale": entry.get("Locale", ""),
+        "gender": entry.get("Gender", ""),
+        "categories": tag.get("ContentCategories") or [],
+        "personalities": tag.get("VoicePersonalities") or [],
+    }
+
+
+class VoiceCatalog:
+    """All Edge voices, indexed by name, locale, gender and personality; refreshed in the background"""
+
+    def __init__(self, path):
+        self.path = path
+        self.source = "bundled"
+        self.updated_at = 0
+        self._index = None
+        self._refresh_lock = threading.Lock()
+        if not self._load_disk():
+            self._install(bundled_voice_snapshot(), "bundled", 0)
+
+    def _install(self, voices, source, updated_at):
+        by_name, by_locale, by_gender, by_style = {}, {}, {}, {}
+        for voice in voices:
+            by_name[voice["name"]] = voice
+            by_locale.setdefault(voice["locale"].lower(), []).append(voice)
+            if voice["gender"]:
+                by_gender.setdefault(voice["gender"].lower(), []).append(voice)
+            for style in voice["personalities"] + voice["categories"]:
+                by_style.setdefault(style.lower(), []).append(voice)
+
+        lang_types = {}
+        for lang in {lang for lang, _ in VOICE_MAPPING}:
+            lang_types[lang] = [{**vt, "edge_voice": VOICE_MAPPING[(lang, vt["id"])]}
+                                for vt in VOICE_TYPES if (lang, vt["id"]) in VOICE_MAPPING]
+
+        body = json.dumps(voices, separators=(",", ":"), sort_keys=True)
+        # Readers grab self._index once, so a refresh swaps everything in a single assignment
+        self._index = {
+            "voices": voices,
+            "by_name": by_name,
+            "by_locale": by_locale,
+            "by_gender": by_gender,
+            "by_style": by_style,
+            "lang_types": lang_types,
+            "etag": hashlib.sha1(body.encode("utf-8")).hexdigest()[:16],
+        }
+        self.source = source
+        self.updated_at = updated_at
+
+    def _load_disk(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            voices = data["voices"]
+        except (OSError, ValueError, KeyError):
+            return False
+        if not voices:
+            return False
+        self._install(voices, "disk", data.get("updated_at", 0))
+        return True
+
+    def _save_disk(self, voices, updated_at):
+        tmp = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"updated_at": updated_at, "voices": voices}, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.warning(f"Voice catalog not persisted: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    @property
+    def etag(self):
+        return self._index["etag"]
+
+    @property
+    def stale(self):
+        return time.time() - self.updated_at > VOICE_CATALOG_MAX_AGE
+
+    def get(self, name):
+        return self._index["by_name"].get(name) if name else None
+
+    def voice_types_for(self, lang):
+        return self._index["lang_types"].get(lang, [])
+
+    def search(self, locale=None, gender=None, style=None):
+        index = self._index
+        voices = index["voices"]
+        if locale:
+            locale = locale.lower()
+            # "en" matches every English locale, "en-GB" only British English
+            voices = (index["by_locale"].get(locale, []) if "-" in locale else
+                      [v for v in voices if v["locale"].lower().split("-")[0] == locale])
+        if gender:
+            voices = [v for v in voices if v["gender"].lower() == gender.lower()]
+        if style:
+            matching = {v["name"] for v in index["by_style"].get(style.lower(), [])}
+            voices = [v for v in voices if v["name"] in matching]
+        return voices
+
+    def refresh(self):
+        """Fetch the live voice list from Edge; keeps the current index on failure"""
+        if not EDGE_AVAILABLE or not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            async def fetch():
+                return await lazy_import("edge_tts").list_voices(connector=loop_worker.connector())
+            voices = [compact_voice(v) for v in run_async(fetch(), timeout=VOICE_CATALOG_TIMEOUT)]
+            if not voices:
+                raise RuntimeError("empty voice list")
+            updated_at = int(time.time())
+            self._save_disk(voices, updated_at)
+            self._install(voices, "edge", updated_at)
+            logging.info(f"🗂️ Voice catalog refreshed: {len(voices)} voices")
+            return True
+        except Exception as e:
+            logging.warning(f"Voice catalog refresh failed, serving {self.source} copy: {e}")
+            return False
+        finally:
+            self._refresh_lock.release()
+
+    def start_background_refresh(self):
+        def loop():
+            while True:
+                if self.stale:
+                    # Another worker may already have refreshed the shared index on disk
+                    self._load_disk()
+                if self.stale:
+                    with process_lock("voice-catalog") as acquired:
+                        if acquired:
+                            self.refresh()
+                time.sleep(min(VOICE_CATALOG_MAX_AGE, 3600))
+        thread = threading.Thread(target=loop, name="voice-catalog", daemon=True)
+        thread.start()
+        return thread
+
+
+voice_catalog = VoiceCatalog(VOICE_CATALOG_PATH)
+if VOICE_CATALOG_REFRESH_ON_STARTUP:
+    voice_catalog.start_background_refresh()
+
+
+# ------------------ Streaming Synthesis ------------------
+def iter_edge_audio(text, voice, rate_str, pitch_str, volume_str):
+    """Yield MP3 chunks from edge-tts as soon as they arrive, from sync code"""
+    chunks = queue.Queue()
+    done = object()
+
+    async def pump():
+        communicate = lazy_import("edge_tts").Communicate(
+            text=text,
+            voice=voice,
+            rate=rate_str,
+            pitch=pitch_str,
+            volume=volume_str,
+            connector=loop_worker.connector()
+        )
+        try:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    chunks.put(chunk["data"])
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            chunks.put(done)
+
+    future = loop_worker.submit(pump())
+    try:
+        while True:
+            item = chunks.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Client went away (or we finished): stop pulling from Edge
+        future.cancel()
+
+
+# ------------------ Stats Aggregator ------------------
+STATS_FLUSH_INTERVAL = float(os.getenv("STATS_FLUSH_INTERVAL", "5"))
+STATS_FLUSH_THRESHOLD = int(os.getenv("STATS_FLUSH_THRESHOLD", "50"))
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "10"))
+STATS_MAX_PENDING_KEYS = 1000  # cap on buffered keys kept for retry while Redis is down
+DEFAULT_TOTAL = 1540
+DEFAULT_TODAY = 12
+
+
+class StatsAggregator:
+    """Buffers usage counters in-process and flushes them to Redis in one pipelined call"""
+
+    def __init__(self, flush_interval, flush_threshold, cache_ttl):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.cache_ttl = cache_ttl
+        self._counters = {}  # key -> pending INCRBY amount
+        self._zincrs = {}  # (zset, member) -> pending ZINCRBY amount
+        self._pending = 0
+        self._snapshot = None  # (total, today, date) last read from Redis
+        self._snapshot_at = 0.0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def _ensure_thread(self):
+        # Started lazily (and restarted after fork) instead of at import time
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="stats-flush", daemon=True)
+                    self._thread.start()
+
+    def record(self, lang):
+        today_key = f"count_{datetime.now().strftime('%Y-%m-%d')}"
+        with self._lock:
+            for key in ("total_translations", today_key):
+                self._counters[key] = self._counters.get(key, 0) + 1
+            zkey = ("popular_languages", lang)
+            self._zincrs[zkey] = self._zincrs.get(zkey, 0) + 1
+            self._pending += 1
+            full = self._pending >= self.flush_threshold
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if time.time() - self._snapshot_at >= self.cache_ttl:
+                self.refresh()
+
+    def flush(self):
+        with self._lock:
+            counters, zincrs = self._counters, self._zincrs
+            self._counters, self._zincrs, self._pending = {}, {}, 0
+        if not counters and not zincrs:
+            return
+        redis = get_redis()
+        if not redis:
+            if redis_configured():
+                # Configured but not connected yet (or inside the retry window): keep the batch
+                self._requeue(counters, zincrs)
+            return
+        try:
+            pipe = redis.pipeline()
+            for key, amount in counters.items():
+                pipe.incrby(key, amount)
+            for (zset, member), amount in zincrs.items():
+                pipe.zincrby(zset, amount, member)
+            pipe.exec()
+            self.flushes += 1
+        except Exception as e:
+            self.flush_errors += 1
+            logging.error(f"Redis stats flush error: {e}")
+            self._requeue(counters, zincrs)
+
+    def _requeue(self, counters, zincrs):
+        # Put the batch back so the next flush retries it
+        with self._lock:
+            for key, amount in counters.items():
+                if key in self._counters or len(self._counters) < STATS_MAX_PENDING_KEYS:
+                    self._counters[key] = self._counters.get(key, 0) + amount
+            for zkey, amount in zincrs.items():
+                if zkey in self._zincrs or len(self._zincrs) < STATS_MAX_PENDING_KEYS:
+                    self._zincrs[zkey] = self._zincrs.get(zkey, 0) + amount
+
+    def refresh(self):
+        """Re-read totals from Redis into the local cache (background thread only)"""
+        redis = get_redis()
+        if not redis:
+            # Unconfigured, or not reachable yet: keep the last snapshot rather than
+            # clearing it, so read() keeps reporting snapshot + pending increments
+            return
+        today = datetime.now().strftime('%Y-%m-%d')
+        try:
+            total, today_count = redis.mget("total_translations", f"count_{today}")
+            with self._lock:
+                self._snapshot = (int(total or DEFAULT_TOTAL), int(today_count or 0), today)
+                self._snapshot_at = time.time()
+        except Exception as e:
+            logging.error(f"Redis stats error: {e}")
+
+    def read(self):
+        """Totals for /stats from the local cache plus not-yet-flushed increments; never blocks on Redis"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        with self._lock:
+            snapshot = self._snapshot
+            stale = time.time() - self._snapshot_at >= self.cache_ttl
+            pending_total = self._counters.get("total_translations", 0)
+            pending_today = self._counters.get(f"count_{today}", 0)
+        if stale:
+            self._ensure_thread()
+            self._wake.set()
+        if snapshot is None:
+            if not redis_configured():
+                return {"total": DEFAULT_TOTAL, "today": DEFAULT_TODAY}
+            return {"total": DEFAULT_TOTAL + pending_total, "today": pending_today}
+        total, today_count, snapshot_day = snapshot
+        if snapshot_day != today:
+            today_count = 0
+        return {"total": total + pending_total, "today": today_count + pending_today}
+
+
+stats_aggregator = StatsAggregator(STATS_FLUSH_INTERVAL, STATS_FLUSH_THRESHOLD, STATS_CACHE_TTL)
+atexit.register(stats_aggregator.flush)
+
+
+# ------------------ Usage Analytics ------------------
+USAGE_ANALYTICS = os.getenv("USAGE_ANALYTICS", "1") == "1"
+USAGE_DB_PATH = os.getenv("USAGE_DB_PATH", os.path.join(TEMP_FOLDER, "voicepro_usage.sqlite3"))
+USAGE_LOG_PATH = os.getenv("USAGE_LOG_PATH", os.path.join(TEMP_FOLDER, "voicepro_events.jsonl"))
+USAGE_LOG_MAX_BYTES = int(os.getenv("USAGE_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "2"))
+USAGE_QUEUE_SIZE = 10000
+
+# Bucket width in seconds and how long each granularity is kept (None = forever)
+USAGE_GRANULARITIES = {
+    "minute": (60, 2 * 86400),
+    "hour": (3600, 90 * 86400),
+    "day": (86400, None),
+}
+USAGE_GROUP_COLUMNS = ("language", "voice", "engine")
+
+USAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_rollups (
+    granularity TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    language TEXT NOT NULL,
+    voice TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    requests INTEGER NOT NULL,
+    chars INTEGER NOT NULL,
+    cache_hits INTEGER NOT NULL,
+    latency_ms_sum REAL NOT NULL,
+    latency_ms_max REAL NOT NULL,
+    PRIMARY KEY (granularity, bucket, language, voice, engine)
+) WITHOUT ROWID
+"""
+
+USAGE_UPSERT = """
+INSERT INTO usage_rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (granularity, bucket, language, voice, engine) DO UPDATE SET
+    requests = requests + excluded.requests,
+    chars = chars + excluded.chars,
+    cache_hits = cache_hits + excluded.cache_hits,
+    latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum,
+    latency_ms_max = MAX(latency_ms_max, excluded.latency_ms_max)
+"""
+
+
+class UsageLog:
+    """Append-only local event log, rolled up into minute/hour/day buckets in SQLite"""
+
+    def __init__(self, db_path, log_path, flush_interval):
+        self.db_path = db_path
+        self.log_path = log_path
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=USAGE_QUEUE_SIZE)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._conn = None
+        self._pruned_at = 0.0
+        self.written = 0
+        self.dropped = 0
+
+    def _connect(self):
+        # The writer's connection is used by the flush thread and at exit, always under _write_lock
+        conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")  # readers never block the writer thread
+        conn.execute(USAGE_SCHEMA)
+        return conn
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="usage-log", daemon=True)
+                    self._thread.start()
+
+    def record(self, **event):
+        """Queue one event; never blocks the request (events are dropped if the writer falls behind)"""
+        event["ts"] = time.time()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self._ensure_thread()
+
+    def _drain(self):
+        events = []
+        try:
+            while len(events) < USAGE_QUEUE_SIZE:
+                events.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return events
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        with self._write_lock:
+            events = self._drain()
+            if not events:
+                return
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                self._append_log(events)
+                self._write_rollups(self._conn, events)
+                self.written += len(events)
+            except Exception as e:
+                logging.error(f"Usage log write error: {e}")
+                self._conn = None
+
+    def _append_log(self, events):
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > USAGE_LOG_MAX_BYTES:
+            os.replace(self.log_path, self.log_path + ".1")
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(e, separators=(",", ":")) + "\n" for e in events)
+
+    def _write_rollups(self, conn, events):
+        # Pre-aggregate the batch so each bucket row is touched once
+        rows = {}
+        for e in events:
+            ts = int(e["ts"])
+            latency = float(e.get("latency_ms") or 0.0)
+            for granularity, (width, _) in USAGE_GRANULARITIES.items():
+                key = (granularity, ts - ts % width, e.get("language", ""), e.get("voice", ""), e.get("engine", ""))
+                row = rows.get(key) or [0, 0, 0, 0.0, 0.0]
+                row[0] += 1
+                row[1] += int(e.get("chars") or 0)
+                row[2] += int(bool(e.get("cached")))
+                row[3] += latency
+                row[4] = max(row[4], latency)
+                rows[key] = row
+        with conn:
+            conn.executemany(USAGE_UPSERT, [key + tuple(row) for key, row in rows.items()])
+            if time.time() - self._pruned_at > 3600:
+                self._pruned_at = time.time()
+                for granularity, (_, retention) in USAGE_GRANULARITIES.items():
+                    if retention:
+                        conn.execute("DELETE FROM usage_rollups WHERE granularity = ? AND bucket < ?",
+                                     (granularity, int(time.time()) - retention))
+
+    def query(self, granularity, start, end, group_by=None):
+        """Bucketed totals for [start, end] (epoch seconds), optionally split by one dimension"""
+        width, _ = USAGE_GRANULARITIES[granularity]
+        group_col = f", {group_by}" if group_by else ""
+        sql = (f"SELECT bucket{group_col}, SUM(requests), SUM(chars), SUM(cache_hits), "
+               f"SUM(latency_ms_sum), MAX(latency_ms_max) FROM usage_rollups "
+               f"WHERE granularity = ? AND bucket BETWEEN ? AND ? "
+               f"GROUP BY bucket{group_col} ORDER BY bucket{group_col}")
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, (granularity, int(start) - int(start) % width, int(end))).fetchall()
+        finally:
+            conn.close()
+
+        buckets = []
+        for row in rows:
+            bucket = dict(zip(["bucket"] + ([group_by] if group_by else []), row[:-5]))
+            requests, chars, hits, latency_sum, latency_max = row[-5:]
+            bucket.update({
+                "time": datetime.fromtimestamp(bucket["bucket"], tz=timezone.utc).isoformat(),
+                "requests": requests,
+                "chars": chars,
+                "cache_hits": hits,
+                "avg_latency_ms": round(latency_sum / requests, 1) if requests else 0.0,
+                "max_latency_ms": round(latency_max, 1),
+            })
+            buckets.append(bucket)
+        return buckets
+
+
+usage_log = UsageLog(USAGE_DB_PATH, USAGE_LOG_PATH, USAGE_FLUSH_INTERVAL)
+atexit.register(usage_log.flush)
+
+
+def record_conversion(lang, voice="", engine="", chars=0, cached=False, latency=None):
+    """Count one finished conversion (buffered, flushed to Redis in the background)"""
+    stats_aggregator.record(lang)
+    if not USAGE_ANALYTICS:
+        return
+    if latency is None and has_request_context() and g.get("request_started") is not None:
+        latency = time.perf_counter() - g.request_started
+    usage_log.record(language=lang, voice=voice, engine=engine, chars=chars, cached=bool(cached),
+                     latency_ms=round((latency or 0.0) * 1000, 1))
+
+
+# ------------------ TTS Backends ------------------
+EDGE_TIMEOUT = float(os.getenv("EDGE_TIMEOUT", "20"))
+GTTS_TIMEOUT = float(os.getenv("GTTS_TIMEOUT", "20"))
+PYTTSX3_TIMEOUT = float(os.getenv("PYTTSX3_TIMEOUT", "30"))
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "4"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_SECONDS = float(os.getenv("BREAKER_SLOW_SECONDS", "10"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+
+
+class SynthesisError(Exception):
+    """No engine could produce audio for a request"""
+
+
+class CircuitBreaker:
+    """Rolling-window breaker: closed -> open on error/slow-call rate, half-open lets one probe through"""
+
+    def __init__(self, name, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 error_rate=BREAKER_ERROR_RATE, slow_seconds=BREAKER_SLOW_SECONDS, cooldown=BREAKER_COOLDOWN):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._results = deque(maxlen=window)  # True = bad call (error or too slow)
+        self._opened_at = 0.0
+        self._probing = False
+        self._last_error = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.time() - self._opened_at >= self.cooldown:
+                self.state = "half-open"
+            if self.state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def _trip(self):
+        self.state = "open"
+        self._opened_at = time.time()
+        self._probing = False
+        logging.warning(f"🔌 Circuit for {self.name} OPEN (last error: {self._last_error})")
+
+    def record_success(self, latency, calls=1):
+        """`calls`: how many sequential engine round trips the render needed (segmented long texts)"""
+        slow = latency > self.slow_seconds * max(1, calls)
+        with self._lock:
+            if slow:
+                self._last_error = f"slow call ({latency:.1f}s)"
+            if self.state == "half-open":
+                if slow:
+                    self._trip()
+                    return
+                self.state = "closed"
+                self._probing = False
+                self._results.clear()
+                logging.info(f"🔌 Circuit for {self.name} closed again")
+                return
+            self._results.append(slow)
+            self._evaluate()
+
+    def record_failure(self, error):
+        with self._lock:
+            self._last_error = str(error)
+            if self.state == "half-open":
+                self._trip()
+                return
+            self._results.append(True)
+            self._evaluate()
+
+    def _evaluate(self):
+        if self.state == "closed" and len(self._results) >= self.min_calls:
+            if sum(self._results) / len(self._results) >= self.error_rate:
+                self._trip()
+
+    def snapshot(self):
+        with self._lock:
+            calls = len(self._results)
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "window_error_rate": round(sum(self._results) / calls, 3) if calls else 0.0,
+                "last_error": self._last_error,
+                "retry_in": max(0.0, round(self._opened_at + self.cooldown - time.time(), 1)) if self.state == "open" else 0.0,
+            }
+
+
+class TTSBackend:
+    """One synthesis engine; render() returns the audio bytes for (text, voice, params)"""
+
+    name = "base"
+    label = "Base"
+    timeout = 30.0
+    output_format = "mp3"
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(self.name)
+
+    @property
+    def available(self):
+        return False
+
+    def render(self, text, lang, voice, params):
+        raise NotImplementedError
+
+    def sequential_calls(self, text):
+        """Rough count of back-to-back engine calls for this text, to scale the slow-call threshold"""
+        return math.ceil(len(text) / SEGMENT_MAX_CHARS) or 1
+
+    def snapshot(self):
+        return {"name": self.name, "label": self.label, "available": self.available,
+                "timeout": self.timeout, **self.breaker.snapshot()}
+
+
+class EdgeBackend(TTSBackend):
+    name = "edge"
+    label = "Edge TTS"
+    timeout = EDGE_TIMEOUT
+
+    @property
+    def available(self):
+        return EDGE_AVAILABLE
+
+    def sequential_calls(self, text):
+        if len(text) <= INCREMENTAL_MIN_CHARS:
+            return 1
+        # Segments render SEGMENT_CONCURRENCY at a time
+        return math.ceil(len(segment_text(text)) / SEGMENT_CONCURRENCY) or 1
+
+    def render(self, text, lang, voice, params):
+        if len(text) > INCREMENTAL_MIN_CHARS:
+            return synthesize_segmented(text, voice, params["rate_str"], params["pitch_str"],
+                                        params["volume_str"], self.timeout)
+        return run_async(
+            edge_render(text, voice, params["rate_str"], params["pitch_str"], params["volume_str"]),
+            timeout=self.timeout
+        )
+
+
+class GTTSBackend(TTSBackend):
+    name = "gtts"
+    label = "Google TTS"
+    timeout = GTTS_TIMEOUT
+
+    @property
+    def available(self):
+        return GTTS_AVAILABLE
+
+    def render(self, text, lang, voice, params):
+        gtts_lang = GTTS_LANG_MAP.get(lang, 'en')
+        tts = lazy_import("gtts").gTTS(text=text, lang=gtts_lang, slow=False, timeout=self.timeout)
+        buffer = io.BytesIO()
+        tts.write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class Pyttsx3Backend(TTSBackend):
+    name = "pyttsx3"
+    label = "System TTS"
+    timeout = PYTTSX3_TIMEOUT
+    output_format = "wav"
+
+    @property
+    def available(self):
+        return PYTTSX3_AVAILABLE
+
+    def render(self, text, lang, voice, params):
+        # pyttsx3 can only write to a path, so this is the one backend that touches TEMP_FOLDER
+        filepath = os.path.join(TEMP_FOLDER, f"tts_{uuid.uuid4().hex}.wav")
+
+        def run_engine():
+            try:
+                engine = lazy_import("pyttsx3").init()
+                engine.setProperty('rate', int(float(params["rate"]) * 150))
+                engine.save_to_file(text, filepath)
+                engine.runAndWait()
+                with open(filepath, "rb") as f:
+                    return f.read()
+            finally:
+                # Cleanup happens on the worker thread, so it also runs if the caller timed out
+                try:
+                    os.remove(filepath)
+                except OSError:
+                    pass
+
+        # pyttsx3 has no timeout of its own; bound how long the request waits on it
+        return blocking_backend_pool.submit(run_engine).result(timeout=self.timeout)
+
+
+blocking_backend_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tts-blocking")
+
+# Priority order: first healthy, available backend wins
+BACKENDS = [EdgeBackend(), GTTSBackend(), Pyttsx3Backend()]
+
+
+def get_backend(name):
+    return next((b for b in BACKENDS if b.name == name), None)
+
+
+def render_with_fallback(text, lang, voice, params):
+    """Try each backend in order, skipping ones whose circuit is open; returns (audio, label, format)"""
+    for backend in BACKENDS:
+        if not backend.available:
+            continue
+        if not backend.breaker.allow():
+            logging.info(f"⏭️ Skipping {backend.label}: circuit open")
+            continue
+        started = time.perf_counter()
+        try:
+            with trace_stage("engine", engine=backend.name, language=lang, voice=voice):
+                audio = backend.render(text, lang, voice, params)
+            if not audio or len(audio) <= 500:
+                raise RuntimeError("no audio received")
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            backend.breaker.record_failure(error)
+            logging.error(f"{backend.label} Error: {error}")
+            continue
+        backend.breaker.record_success(time.perf_counter() - started, backend.sequential_calls(text))
+        logging.info(f"✅ {backend.label} OK: voice={voice}, rate={params['rate_str']}, pitch={params['pitch_str']}")
+        return audio, backend.label, backend.output_format
+    raise SynthesisError(f"All TTS engines failed for voice={voice}")
+
+
+# ------------------ Output Formats ------------------
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", "2"))
+TRANSCODE_TIMEOUT = float(os.getenv("TRANSCODE_TIMEOUT", "60"))
+DEFAULT_FORMAT = "mp3"
+
+# Edge always returns 24 kHz / 48 kbps mono MP3 (edge-tts does not expose its outputFormat),
+# so every other format is an ffmpeg transcode of that source.
+AUDIO_FORMATS = {
+    "mp3":     {"mimetype": "audio/mpeg", "ext": "mp3",
+                "ffmpeg": ["-ac", "1", "-c:a", "libmp3lame", "-b:a", "48k", "-f", "mp3"]},
+    "mp3-low": {"mimetype": "audio/mpeg", "ext": "mp3",
+                "ffmpeg": ["-ac", "1", "-ar", "16000", "-c:a", "libmp3lame", "-b:a", "24k", "-f", "mp3"]},
+    "opus":    {"mimetype": "audio/ogg", "ext": "opus",
+                "ffmpeg": ["-ac", "1", "-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-f", "ogg"]},
+    "ogg":     {"mimetype": "audio/ogg", "ext": "ogg",
+                "ffmpeg": ["-ac", "1", "-c:a", "libvorbis", "-q:a", "4", "-f", "ogg"]},
+    "wav":     {"mimetype": "audio/wav", "ext": "wav",
+                "ffmpeg": ["-ac", "1", "-ar", "24000", "-c:a", "pcm_s16le", "-f", "wav"]},
+    "wav-8k":  {"mimetype": "audio/wav", "ext": "wav",
+                "ffmpeg": ["-ac", "1", "-ar", "8000", "-c:a", "pcm_s16le", "-f", "wav"]},
+}
+
+transcode_pool = ThreadPoolExecutor(max_workers=TRANSCODE_WORKERS, thread_name_prefix="transcode")
+
+
+def normalize_format(format_type):
+    format_type = (format_type or DEFAULT_FORMAT).strip().lower()
+    return format_type if format_type in AUDIO_FORMATS else DEFAULT_FORMAT
+
+
+def ffmpeg_path():
+    return shutil.which(FFMPEG_BIN)
+
+
+def audio_variant_key(source_key, format_type):
+    """Cache key for a transcoded variant, stored alongside its source"""
+    return hashlib.sha256(f"{source_key}:{format_type}".encode('utf-8')).hexdigest()
+
+
+def transcode(audio, format_type):
+    cmd = [ffmpeg_path() or FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-i", "pipe:0", "-vn"]
+    cmd += AUDIO_FORMATS[format_type]["ffmpeg"] + ["pipe:1"]
+    proc = subprocess.run(cmd, input=audio, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+    if proc.returncode != 0 or not proc.stdout:
+        raise RuntimeError(proc.stderr.decode('utf-8', 'replace').strip() or f"ffmpeg exited with {proc.returncode}")
+    return proc.stdout
+
+
+def deliver_format(source_key, audio, source_format, format_type, lang="", voice=""):
+    """Return (audio, cache key, format actually produced) for the requested output format"""
+    if format_type == source_format:
+        return audio, source_key, source_format
+
+    variant_key = audio_variant_key(source_key, format_type)
+    cached = audio_cache.get(variant_key)
+    if cached:
+        return cached[0], variant_key, format_type
+
+    if not ffmpeg_path():
+        logging.warning(f"ffmpeg not found; serving {source_format} instead of {format_type}")
+        return audio, source_key, source_format
+    try:
+        with trace_stage("transcode", engine=format_type, language=lang, voice=voice):
+            converted = transcode_pool.submit(transcode, audio, format_type).result(TRANSCODE_TIMEOUT + 5)
+    except Exception as e:
+        logging.error(f"Transcode to {format_type} failed: {e}")
+        return audio, source_key, source_format
+
+    audio_cache.put(variant_key, converted, {"format": format_type, "source": source_key})
+    return converted, variant_key, format_type
+
+
+# ------------------ Request Coalescing ------------------
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers with the same key share its result"""
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+            self.waiters = 0
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Returns (result, shared); `shared` is True when another caller did the work"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+                self.leaders += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+synthesis_flight = SingleFlight()
+
+
+# ------------------ Synthesis Pipeline ------------------
+def synthesize(text, lang, voice_type, rate='1.0', pitch='0', volume='100', format_type=DEFAULT_FORMAT,
+               style=None):
+    """Resolve voice params, then serve from the audio cache or run the engine fallback chain"""
+    with trace_stage("voice", language=lang):
+        voice = get_voice(lang, voice_type)
+        rate, pitch, volume = apply_style(style, rate, pitch, volume)
+        rate_str = build_rate_str(rate)
+        pitch_str = build_pitch_str(pitch)
+        volume_str = build_volume_str(volume)
+    logging.info(f"TTS: lang={lang}, voice_type={voice_type}, voice={voice}, len={len(text)}")
+
+    cache_key = audio_cache_key(text, voice, rate_str, pitch_str, volume_str)
+    format_type = normalize_format(format_type)
+
+    def produce():
+        with trace_stage("cache_read", language=lang, voice=voice):
+            cached = audio_cache.get(cache_key)
+
+        if cached:
+            audio_bytes, cache_meta = cached
+            method_used = cache_meta.get("method", "Edge TTS")
+            source_format = cache_meta.get("format", DEFAULT_FORMAT)
+            logging.info(f"⚡ Audio cache hit: {cache_key[:12]}")
+        else:
+            params = {"rate": rate, "rate_str": rate_str, "pitch_str": pitch_str, "volume_str": volume_str}
+            audio_bytes, method_used, source_format = render_with_fallback(text, lang, voice, params)
+            with trace_stage("cache_write", language=lang, voice=voice):
+                audio_cache.put(cache_key, audio_bytes,
+                                {"method": method_used, "voice": voice, "format": source_format})
+
+        audio_bytes, delivered_key, produced_format = deliver_format(
+            cache_key, audio_bytes, source_format, format_type, lang, voice)
+        return {
+            "audio": audio_bytes,
+            "method": method_used,
+            "voice": voice,
+            "cache_key": delivered_key,
+            "cached": bool(cached),
+            "format": produced_format,
+            "mimetype": AUDIO_FORMATS[produced_format]["mimetype"],
+            "ext": AUDIO_FORMATS[produced_format]["ext"],
+        }
+
+    # Identical concurrent requests (same text, voice, prosody and format) share one render
+    result, shared = synthesis_flight.do(f"{cache_key}:{format_type}", produce)
+    if shared:
+        logging.info(f"🔗 Coalesced with in-flight synthesis: {cache_key[:12]}")
+    return dict(result, coalesced=shared)
+
+
+# ------------------ Script Mode ------------------
+SCRIPT_MAX_SEGMENTS = int(os.getenv("SCRIPT_MAX_SEGMENTS", "200"))
+SCRIPT_CONCURRENCY = int(os.getenv("SCRIPT_CONCURRENCY", "4"))
+SCRIPT_DEFAULT_PAUSE_MS = int(os.getenv("SCRIPT_DEFAULT_PAUSE_MS", "300"))
+SCRIPT_MAX_PAUSE_MS = 10000
+
+# One silent MPEG-2 Layer III frame matching Edge's output (24 kHz, 48 kbps, mono): 144 bytes, 24 ms
+SILENT_MP3_FRAME = b"\xff\xf3\x64\xc4" + b"\x00" * 140
+SILENT_FRAME_MS = 24
+
+script_pool = ThreadPoolExecutor(max_workers=SCRIPT_CONCURRENCY, thread_name_prefix="script")
+
+
+class ScriptError(ValueError):
+    pass
+
+
+def _optional_str(value, what):
+    if value is not None and not isinstance(value, str):
+        raise ScriptError(f"{what} must be a string")
+    return value
+
+
+def mp3_silence(ms):
+    return SILENT_MP3_FRAME * max(0, round(ms / SILENT_FRAME_MS))
+
+
+def parse_script(data, default_lang='en-US', default_voice_type='female-1'):
+    """Validate a script payload into a list of segment dicts"""
+    segments = data.get('segments') if isinstance(data, dict) else None
+    if not isinstance(segments, list) or not segments:
+        raise ScriptError("Provide a non-empty 'segments' list")
+    if len(segments) > SCRIPT_MAX_SEGMENTS:
+        raise ScriptError(f"Too many segments. Maximum {SCRIPT_MAX_SEGMENTS} allowed.")
+    _optional_str(default_lang, "'language'")
+    _optional_str(default_voice_type, "'voice_type'")
+
+    parsed = []
+    for i, seg in enumerate(segments):
+        if not isinstance(seg, dict) or not isinstance(seg.get('text'), str) or not seg['text'].strip():
+            raise ScriptError(f"Segment {i} needs non-empty 'text'")
+        try:
+            pause = int(seg.get('pause', SCRIPT_DEFAULT_PAUSE_MS))
+        except (TypeError, ValueError, OverflowError):
+            raise ScriptError(f"Segment {i} has an invalid 'pause'")
+        for field in ('language', 'lang', 'voice_type', 'style'):
+            _optional_str(seg.get(field), f"Segment {i} '{field}'")
+        for field in ('rate', 'pitch', 'volume'):
+            if not isinstance(seg.get(field, ''), (str, int, float)):
+                raise ScriptError(f"Segment {i} '{field}' must be a number or string")
+        parsed.append({
+            "text": seg['text'].strip(),
+            "lang": seg.get('language') or seg.get('lang') or default_lang,
+            "voice_type": seg.get('voice_type') or default_voice_type,
+            "rate": seg.get('rate', '1.0'),
+            "pitch": seg.get('pitch', '0'),
+            "volume": seg.get('volume', '100'),
+            "style": seg.get('style'),
+            "pause": min(max(pause, 0), SCRIPT_MAX_PAUSE_MS),
+        })
+
+    if sum(len(seg["text"]) for seg in parsed) > MAX_TEXT_CHARS:
+        raise ScriptError(f"Script too long. Maximum {MAX_TEXT_CHARS} characters allowed.")
+    return parsed
+
+
+def _render_script_segment(seg):
+    rendered = synthesize(seg["text"], seg["lang"], seg["voice_type"], seg["rate"], seg["pitch"],
+                          seg["volume"], "mp3", style=seg["style"])
+    if rendered["format"] != "mp3":
+        raise SynthesisError(f"{rendered['method']} produced {rendered['format']}, which cannot be frame-joined")
+    return rendered
+
+
+def render_script(segments, format_type=DEFAULT_FORMAT):
+    """Render every segment concurrently, then join them with silence gaps at MP3 frame level"""
+    rendered = list(script_pool.map(_render_script_segment, segments))
+
+    # The script's cache key is derived from each segment's key plus its trailing pause
+    script_key = hashlib.sha256("\x1f".join(
+        f"{r['cache_key']}:{seg['pause']}" for r, seg in zip(rendered, segments)).encode('utf-8')).hexdigest()
+    cached = audio_cache.get(script_key)
+    if cached:
+        audio = cached[0]
+    else:
+        parts = []
+        for i, (r, seg) in enumerate(zip(rendered, segments)):
+            parts.append(r["audio"])
+            if seg["pause"] and i < len(segments) - 1:
+                parts.append(mp3_silence(seg["pause"]))
+        with trace_stage("concat"):
+            audio = concat_mp3(parts)
+        audio_cache.put(script_key, audio, {"method": "Script", "voice": "script", "format": "mp3"})
+
+    audio, delivered_key, produced_format = deliver_format(script_key, audio, "mp3", normalize_format(format_type))
+    return {
+        "audio": audio,
+        "cache_key": delivered_key,
+        "cached": bool(cached),
+        "format": produced_format,
+        "mimetype": AUDIO_FORMATS[produced_format]["mimetype"],
+        "ext": AUDIO_FORMATS[produced_format]["ext"],
+        "voices": [r["voice"] for r in rendered],
+        "methods": sorted({r["method"] for r in rendered}),
+    }
+
+
+# ------------------ Batch Jobs ------------------
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_PER_VOICE_LIMIT = int(os.getenv("JOB_PER_VOICE_LIMIT", "2"))
+JOB_MAX_ITEMS = int(os.getenv("JOB_MAX_ITEMS", "500"))
+JOB_TTL = int(os.getenv("JOB_TTL", str(24 * 3600)))
+JOBS_BACKEND = os.getenv("JOBS_BACKEND", "disk")  # "redis": mirror job state so any instance can answer polls
+# "disk" backend: one JSON file per job, shared by every worker process on this host
+JOBS_DIR = os.path.join(TEMP_FOLDER, "voicepro_jobs")
+
+
+class JobQueue:
+    """Bounded worker pool for batch TTS with per-voice concurrency limits"""
+
+    def __init__(self, workers, per_voice_limit, folder):
+        self.per_voice_limit = per_voice_limit
+        self.folder = folder
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-job")
+        # Items wait here, per edge voice, until that voice has a free slot; only then do they
+        # reach the pool, so a large single-voice batch never parks workers other voices need
+        self._ready = {}  # edge voice -> deque of (job id, item index, text)
+        self._running = {}  # edge voice -> items handed to the pool
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.pending = 0  # items queued or running in this process
+
+    @property
+    def use_redis(self):
+        return JOBS_BACKEND == "redis" and get_redis() is not None
+
+    def _dispatch(self, voice):
+        # Caller must hold the lock
+        ready = self._ready.get(voice)
+        while ready and self._running.get(voice, 0) < self.per_voice_limit:
+            self._running[voice] = self._running.get(voice, 0) + 1
+            self._executor.submit(self._run_item, voice, *ready.popleft())
+        if not ready:
+            self._ready.pop(voice, None)
+
+    def _path(self, job_id):
+        return os.path.join(self.folder, f"{job_id}.json")
+
+    def _save(self, job):
+        if self.use_redis:
+            try:
+                get_redis().set(f"job:{job['id']}", json.dumps(job), ex=JOB_TTL)
+            except Exception as e:
+                logging.error(f"Redis job save error: {e}")
+            return
+        tmp_path = f"{self._path(job['id'])}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(job, f)
+            os.replace(tmp_path, self._path(job["id"]))
+        except OSError as e:
+            logging.error(f"Job state write error: {e}")
+
+    def _load(self, job_id):
+        if self.use_redis:
+            try:
+                raw = get_redis().get(f"job:{job_id}")
+                if raw:
+                    return json.loads(raw)
+            except Exception as e:
+                logging.error(f"Redis job read error: {e}")
+            return None
+        try:
+            with open(self._path(job_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _purge_expired(self):
+        cutoff = time.time() - JOB_TTL
+        with self._lock:
+            for job_id in [j for j, job in self._jobs.items() if job["created"] < cutoff]:
+                del self._jobs[job_id]
+        if self.use_redis:
+            return
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+        except OSError:
+            pass
+
+    def submit(self, items):
+        self._purge_expired()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "created": time.time(),
+            "total": len(items),
+            "completed": 0,
+            "failed": 0,
+            "items": [
+                {
+                    "index": i,
+                    "status": "queued",
+                    "language": item.get('language', 'en-US'),
+                    "voice_type": item.get('voice_type', 'female-1'),
+                    "rate": str(item.get('rate', '1.0')),
+                    "pitch": str(item.get('pitch', '0')),
+                    "volume": str(item.get('volume', '100')),
+                    "format": normalize_format(item.get('format')),
+                    "chars": len(item['text']),
+                }
+                for i, item in enumerate(items)
+            ],
+        }
+        voices = [get_voice(entry["language"], entry["voice_type"]) for entry in job["items"]]
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self.pending += len(items)
+        self._save(job)
+        with self._lock:
+            for i, (item, voice) in enumerate(zip(items, voices)):
+                self._ready.setdefault(voice, deque()).append((job["id"], i, item['text']))
+            for voice in set(voices):
+                self._dispatch(voice)
+        return job
+
+    def _run_item(self, voice, job_id, index, text):
+        try:
+            self._render_item(job_id, index, text)
+        finally:
+            with self._lock:
+                self._running[voice] -= 1
+                if not self._running[voice]:
+                    del self._running[voice]
+                self._dispatch(voice)
+
+    def _render_item(self, job_id, index, text):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                self.pending -= 1
+                return
+            entry = job["items"][index]
+            entry["status"] = "running"
+            job["status"] = "running"
+
+        try:
+            started = time.perf_counter()
+            rendered = synthesize(text, entry["language"], entry["voice_type"],
+                                  entry["rate"], entry["pitch"], entry["volume"], entry["format"])
+            record_conversion(entry["language"], rendered["voice"], rendered["method"], len(text),
+                              rendered["cached"], time.perf_counter() - started)
+            update = {"status": "done", "audio_id": rendered["cache_key"], "method": rendered["method"],
+                      "voice": rendered["voice"], "format": rendered["format"], "ext": rendered["ext"]}
+        except Exception as e:
+            logging.error(f"Job {job_id} item {index} error: {e}")
+            update = {"status": "failed", "error": str(e)}
+
+        with self._lock:
+            self.pending -= 1
+            entry.update(update)
+            job["completed" if update["status"] == "done" else "failed"] += 1
+            if job["completed"] + job["failed"] == job["total"]:
+                job["status"] = "completed" if not job["failed"] else ("failed" if not job["completed"] else "partial")
+                job["finished"] = time.time()
+            snapshot = json.loads(json.dumps(job))
+        self._save(snapshot)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return json.loads(json.dumps(job))
+        # Submitted through another worker or instance
+        if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+            return None
+        return self._load(job_id)
+
+
+job_queue = JobQueue(JOB_WORKERS, JOB_PER_VOICE_LIMIT, JOBS_DIR)
+
+
+# ------------------ Rate Limiting & Admission Control ------------------
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "1"))  # tokens refilled per second, per client
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_CHARS_PER_TOKEN = int(os.getenv("RATE_LIMIT_CHARS_PER_TOKEN", "1000"))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "redis": share buckets across instances
+MAX_INFLIGHT_SYNTHESIS = int(os.getenv("MAX_INFLIGHT_SYNTHESIS", "8"))
+MAX_SYNTHESIS_QUEUE = int(os.getenv("MAX_SYNTHESIS_QUEUE", "16"))
+SYNTHESIS_QUEUE_TIMEOUT = float(os.getenv("SYNTHESIS_QUEUE_TIMEOUT", "10"))
+
+# Token bucket in one atomic round trip; state is a hash {tokens, ts} that expires once full again
+RATE_LIMIT_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets, in-process or shared through Redis"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # client key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    @property
+    def use_redis(self):
+        return RATE_LIMIT_BACKEND == "redis" and get_redis() is not None
+
+    def _retry_after(self, tokens, cost):
+        return max(0.0, (cost - tokens) / self.rate)
+
+    def take(self, key, cost=1.0):
+        """Spend `cost` tokens; returns (allowed, seconds until enough tokens)"""
+        # A request costing more than a full bucket could otherwise never be admitted
+        cost = min(cost, self.burst)
+        if self.use_redis:
+            try:
+                allowed, tokens = get_redis().eval(
+                    RATE_LIMIT_LUA, keys=[f"ratelimit:{key}"],
+                    args=[str(self.rate), str(self.burst), f"{time.time():.3f}", str(cost)])
+                return bool(int(allowed)), self._retry_after(float(tokens), cost)
+            except Exception as e:
+                # Shared store down: keep limiting locally rather than failing requests
+                logging.error(f"Redis rate limit error: {e}")
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > 10000:
+                self._prune(now)
+        return allowed, 0.0 if allowed else self._retry_after(tokens, cost)
+
+    def _prune(self, now):
+        # Caller holds the lock; a bucket that has refilled is the same as no bucket
+        full_after = self.burst / self.rate
+        for key in [k for k, (_, ts) in self._buckets.items() if now - ts > full_after]:
+            del self._buckets[key]
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__("synthesis capacity exhausted")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Global cap on in-flight syntheses with a bounded, time-limited wait queue"""
+
+    def __init__(self, max_inflight, max_queue, wait_timeout):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def acquire(self):
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(self.wait_timeout)
+            self.waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.wait_timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(self.wait_timeout)
+        with self._lock:
+            self.inflight += 1
+
+    def release(self):
+        with self._lock:
+            self.inflight -= 1
+        self._slots.release()
+
+    def snapshot(self):
+        with self._lock:
+            return {"inflight": self.inflight, "waiting": self.waiting, "rejected": self.rejected,
+                    "max_inflight": self.max_inflight, "max_queue": self.max_queue}
+
+
+rate_limiter = TokenBucketLimiter(RATE_LIMIT_RATE, RATE_LIMIT_BURST)
+admission = AdmissionController(MAX_INFLIGHT_SYNTHESIS, MAX_SYNTHESIS_QUEUE, SYNTHESIS_QUEUE_TIMEOUT)
+
+
+def _api_key_digest(api_key):
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+# Only keys on this allow-list get their own bucket; anything else is limited by client address
+RATE_LIMIT_API_KEYS = {_api_key_digest(k.strip()) for k in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if k.strip()}
+
+
+def client_key():
+    """An allow-listed API key, otherwise the client IP (as resolved by ProxyFix, if configured)"""
+    api_key = request.headers.get('X-API-Key')
+    if api_key:
+        digest = _api_key_digest(api_key)
+        if digest in RATE_LIMIT_API_KEYS:
+            return "key:" + digest
+    return "ip:" + (request.remote_addr or "unknown")
+
+
+def text_cost():
+    """Bucket tokens for a synthesis request: one, plus one per RATE_LIMIT_CHARS_PER_TOKEN chars"""
+    return 1 + len(request.values.get('text', '')) // RATE_LIMIT_CHARS_PER_TOKEN
+
+
+def _too_busy(status, message, retry_after):
+    retry_after = max(1, math.ceil(retry_after))
+    resp = jsonify({'error': message, 'retry_after': retry_after})
+    resp.status_code = status
+    resp.headers['Retry-After'] = str(retry_after)
+    return resp
+
+
+def limit_synthesis(cost=lambda: 1, admit=True):
+    """Decorator: per-client token bucket, then a slot from the global admission controller"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            allowed, retry_after = rate_limiter.take(client_key(), cost())
+            if not allowed:
+                return _too_busy(429, 'Too many requests. Please slow down.', retry_after)
+            if not admit:
+                return view(*args, **kwargs)
+            try:
+                admission.acquire()
+            except Overloaded as e:
+                return _too_busy(503, 'Server is busy. Please try again shortly.', e.retry_after)
+            try:
+                resp = make_response(view(*args, **kwargs))
+            except BaseException:
+                admission.release()
+                raise
+            if resp.is_streamed:
+                # Hold the slot until the streamed body is finished
+                resp.call_on_close(admission.release)
+            else:
+                admission.release()
+            return resp
+        return wrapper
+    return decorator
+
+
+@app.cli.command("warm-previews")
+def warm_previews_command():
+    """Render every voice preview into the on-disk bank"""
+    rendered, present, failed = preview_bank.warm()
+    print(f"Previews: {rendered} rendered, {present} already cached, {failed} failed")
+
+
+# ------------------ HTTP Caching & Compression ------------------
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "512"))
+INDEX_CACHE_CONTROL = os.getenv("INDEX_CACHE_CONTROL", "public, max-age=600")
+METADATA_CACHE_CONTROL = os.getenv("METADATA_CACHE_CONTROL", "public, max-age=86400, stale-while-revalidate=604800")
+BROTLI_AVAILABLE = _installed("brotli")  # optional: pip install brotli
+
+
+class CompressedBody:
+    """A response body encoded at most once per Content-Encoding, with a content ETag"""
+
+    def __init__(self, body, mimetype, last_modified=None):
+        self.mimetype = mimetype
+        self.last_modified = last_modified
+        self.etag = hashlib.sha1(body).hexdigest()[:16]
+        self._encoded = {"identity": body}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        if encoding not in self._encoded:
+            with self._lock:
+                if encoding not in self._encoded:
+                    body = self._encoded["identity"]
+                    if encoding == "br":
+                        self._encoded[encoding] = lazy_import("brotli").compress(body, quality=11)
+                    else:
+                        self._encoded[encoding] = gzip.compress(body, compresslevel=9, mtime=0)
+        return self._encoded[encoding]
+
+    def pick_encoding(self):
+        if len(self._encoded["identity"]) < COMPRESS_MIN_BYTES:
+            return "identity"
+        accepted = request.accept_encodings
+        if BROTLI_AVAILABLE and accepted["br"]:
+            return "br"
+        if accepted["gzip"]:
+            return "gzip"
+        return "identity"
+
+    def response(self, cache_control):
+        encoding = self.pick_encoding()
+        resp = Response(self.encoded(encoding), mimetype=self.mimetype)
+        resp.vary.add("Accept-Encoding")
+        if encoding == "identity":
+            resp.set_etag(self.etag)
+        else:
+            # Each encoding is a different representation, so it gets its own validator
+            resp.headers["Content-Encoding"] = encoding
+            resp.set_etag(f"{self.etag}-{encoding}")
+        if self.last_modified:
+            resp.last_modified = self.last_modified
+        resp.headers["Cache-Control"] = cache_control
+        return resp.make_conditional(request)
+
+
+class RenderedPage:
+    """A template rendered once (its context never changes); re-rendered on edit in debug mode"""
+
+    def __init__(self, template, **context):
+        self.template = template
+        self.context = context
+        self.path = os.path.join(app.root_path, app.template_folder, template)
+        self._body = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._body is not None and not (app.debug or app.config.get("TEMPLATES_AUTO_RELOAD")):
+            return self._body
+        mtime = os.path.getmtime(self.path)
+        with self._lock:
+            if self._body is None or mtime != self._mtime:
+                html = render_template(self.template, **self.context).encode("utf-8")
+                modified = datetime.fromtimestamp(int(mtime), tz=timezone.utc)
+                self._body = CompressedBody(html, "text/html", last_modified=modified)
+                self._mtime = mtime
+        return self._body
+
+
+class ResponseBodyCache:
+    """Small LRU of encoded JSON bodies, keyed by URL plus the version of the data behind it"""
+
+    def __init__(self, max_items=256):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            body = self._items.get(key)
+            if body is not None:
+                self._items.move_to_end(key)
+                return body
+        body = build()
+        with self._lock:
+            self._items[key] = body
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return body
+
+
+index_page = RenderedPage('index.html', languages=LANGUAGES, voice_types=VOICE_TYPES, max_chars=MAX_TEXT_CHARS)
+metadata_bodies = ResponseBodyCache()
+_sitemap_body = None
+
+
 # ------------------ Routes ------------------
 @app.route('/')
 def home():
-    return render_template('index.html', languages=LANGUAGES, voice_types=VOICE_TYPES)
+    return index_page.get().response(INDEX_CACHE_CONTROL)
 
 
 @app.route('/stats')
 def stats():
-    total = 1540
-    today = 12
-    if redis:
-        try:
-            total = int(redis.get("total_translations") or 1540)
-            today_key = f"count_{datetime.now().strftime('%Y-%m-%d')}"
-            today = int(redis.get(today_key) or 0)
-        except Exception as e:
-            logging.error(f"Redis stats error: {e}")
-    return jsonify({"total": total, "today": today})
+    return jsonify(stats_aggregator.read())
+
+
+MAX_EPOCH_SECONDS = datetime(9999, 12, 31, 23, 59, 59, tzinfo=timezone.utc).timestamp()
+
+
+def _parse_time(value, default):
+    """Epoch seconds or ISO 8601 (UTC unless an offset is given)"""
+    if not value:
+        return default
+    try:
+        stamp = float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        stamp = parsed.timestamp()
+    if not math.isfinite(stamp) or not 0 <= stamp <= MAX_EPOCH_SECONDS:
+        raise ValueError(f"time out of range: {value!r}")
+    return stamp
+
+
+@app.route('/stats/detail')
+def stats_detail():
+    """Usage rollups: ?granularity=minute|hour|day&start=&end=&group_by=language|voice|engine"""
+    granularity = request.args.get('granularity', 'hour')
+    group_by = request.args.get('group_by') or None
+    if granularity not in USAGE_GRANULARITIES:
+        return jsonify({'error': f'granularity must be one of {", ".join(USAGE_GRANULARITIES)}'}), 400
+    if group_by and group_by not in USAGE_GROUP_COLUMNS:
+        return jsonify({'error': f'group_by must be one of {", ".join(USAGE_GROUP_COLUMNS)}'}), 400
+
+    width, _ = USAGE_GRANULARITIES[granularity]
+    now = time.time()
+    try:
+        end = _parse_time(request.args.get('end'), now)
+        start = _parse_time(request.args.get('start'), end - 60 * width)
+    except (ValueError, OverflowError):
+        return jsonify({'error': 'start/end must be epoch seconds or ISO 8601'}), 400
+    if end < start:
+        return jsonify({'error': 'end must not be before start'}), 400
+    if (end - start) / width > 10000:
+        return jsonify({'error': 'Range too large for this granularity'}), 400
+
+    buckets = usage_log.query(granularity, start, end, group_by)
+    requests_total = sum(b["requests"] for b in buckets)
+    return jsonify({
+        "granularity": granularity,
+        "group_by": group_by,
+        "start": datetime.fromtimestamp(start, tz=timezone.utc).isoformat(),
+        "end": datetime.fromtimestamp(end, tz=timezone.utc).isoformat(),
+        "totals": {
+            "requests": requests_total,
+            "chars": sum(b["chars"] for b in buckets),
+            "cache_hits": sum(b["cache_hits"] for b in buckets),
+        },
+        "buckets": buckets,
+    })
 
 
 @app.route('/convert', methods=['POST'])
+@limit_synthesis(cost=text_cost)
 def convert():
     if not EDGE_AVAILABLE and not GTTS_AVAILABLE and not PYTTSX3_AVAILABLE:
         return jsonify({'error': 'No TTS library installed. Run: pip install edge-tts'}), 500
@@ -389,146 +2818,320 @@ def convert():
         volume = request.form.get('volume', '100')
         style = request.form.get('style', 'general')
         format_type = request.form.get('format', 'mp3')
+        response_type = request.form.get('response_type', 'base64')
 
         if not text:
             return jsonify({'error': 'Please enter text to convert'}), 400
 
-        if len(text) > 5000:
-            return jsonify({'error': 'Text too long. Maximum 5000 characters allowed.'}), 400
+        if len(text) > MAX_TEXT_CHARS:
+            return jsonify({'error': f'Text too long. Maximum {MAX_TEXT_CHARS} characters allowed.'}), 400
 
-        voice = get_voice(lang, voice_type)
-        logging.info(f"TTS: lang={lang}, voice_type={voice_type}, voice={voice}, len={len(text)}")
-
-        filename = f"tts_{uuid.uuid4().hex}.mp3"
-        filepath = os.path.join(TEMP_FOLDER, filename)
-        success = False
-        method_used = "none"
-
-        # ---- Edge TTS (Best Quality) ----
-        if EDGE_AVAILABLE:
-            try:
-                rate_str = build_rate_str(rate)
-                pitch_str = build_pitch_str(pitch)
-                volume_str = build_volume_str(volume)
-
-                async def generate_edge():
-                    communicate = edge_tts.Communicate(
-                        text=text,
-                        voice=voice,
-                        rate=rate_str,
-                        pitch=pitch_str,
-                        volume=volume_str
-                    )
-                    await communicate.save(filepath)
-
-                asyncio.run(generate_edge())
-
-                if os.path.exists(filepath) and os.path.getsize(filepath) > 500:
-                    success = True
-                    method_used = "Edge TTS"
-                    logging.info(f"✅ Edge TTS OK: voice={voice}, rate={rate_str}, pitch={pitch_str}")
-                else:
-                    logging.warning("Edge TTS file empty or missing")
-            except Exception as e:
-                logging.error(f"Edge TTS Error: {e}")
-
-        # ---- gTTS Fallback ----
-        if not success and GTTS_AVAILABLE:
-            try:
-                gtts_lang = GTTS_LANG_MAP.get(lang, 'en')
-                tts = gTTS(text=text, lang=gtts_lang, slow=False)
-                tts.save(filepath)
-                if os.path.exists(filepath) and os.path.getsize(filepath) > 500:
-                    success = True
-                    method_used = "Google TTS"
-                    logging.info(f"✅ gTTS OK")
-            except Exception as e:
-                logging.error(f"gTTS Error: {e}")
-
-        # ---- pyttsx3 Fallback ----
-        if not success and PYTTSX3_AVAILABLE:
-            try:
-                engine = pyttsx3.init()
-                engine.setProperty('rate', int(float(rate) * 150))
-                engine.save_to_file(text, filepath)
-                engine.runAndWait()
-                if os.path.exists(filepath) and os.path.getsize(filepath) > 500:
-                    success = True
-                    method_used = "System TTS"
-            except Exception as e:
-                logging.error(f"pyttsx3 Error: {e}")
-
-        if not success:
+        try:
+            rendered = synthesize(text, lang, voice_type, rate, pitch, volume, format_type, style=style)
+        except SynthesisError:
             return jsonify({'error': 'Audio generation failed. Please try again.'}), 500
+        audio_bytes = rendered["audio"]
+        cache_key = rendered["cache_key"]
+        method_used = rendered["method"]
+        voice = rendered["voice"]
+        cached = rendered["cached"]
 
         # ---- Redis Stats ----
-        if redis:
-            try:
-                redis.incr("total_translations")
-                redis.incr(f"count_{datetime.now().strftime('%Y-%m-%d')}")
-                redis.zincrby("popular_languages", 1, lang)
-            except Exception as e:
-                logging.error(f"Redis update error: {e}")
+        with trace_stage("stats", language=lang):
+            record_conversion(lang, voice, method_used, len(text), cached)
 
         # ---- Return Response ----
-        with open(filepath, "rb") as f:
-            audio_base64 = base64.b64encode(f.read()).decode('utf-8')
-
-        try:
-            os.remove(filepath)
-        except:
-            pass
-
-        return jsonify({
+        result = {
             "success": True,
-            "audio_data": f"data:audio/mp3;base64,{audio_base64}",
-            "filename": f"voicepro_{lang}_{voice_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp3",
+            "filename": f"voicepro_{lang}_{voice_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{rendered['ext']}",
             "method": method_used,
             "voice_used": voice,
             "language": lang,
-            "voice_type": voice_type
-        })
+            "voice_type": voice_type,
+            "format": rendered["format"],
+            "mimetype": rendered["mimetype"],
+            "cached": bool(cached)
+        }
+        if response_type == 'url':
+            # Bytes stay in the audio cache; the client fetches them raw from /audio/<id>
+            result["audio_id"] = cache_key
+            result["audio_url"] = f"/audio/{cache_key}"
+        else:
+            with trace_stage("encode", language=lang, voice=voice):
+                audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
+            result["audio_data"] = f"data:{rendered['mimetype']};base64,{audio_base64}"
+
+        return jsonify(result)
 
     except Exception as e:
         logging.error(f"Convert error: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+def script_cost():
+    data = request.get_json(silent=True)
+    segments = data.get('segments') if isinstance(data, dict) and isinstance(data.get('segments'), list) else []
+    chars = sum(len(str(seg.get('text', ''))) for seg in segments if isinstance(seg, dict))
+    return 1 + chars // RATE_LIMIT_CHARS_PER_TOKEN
+
+
+@app.route('/convert/script', methods=['POST'])
+@limit_synthesis(cost=script_cost)
+def convert_script():
+    """Multi-voice script: JSON segments rendered concurrently and stitched with pauses"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Send a JSON object with a "segments" list'}), 400
+    try:
+        segments = parse_script(data, data.get('language', 'en-US'), data.get('voice_type', 'female-1'))
+        _optional_str(data.get('format'), "'format'")
+    except ScriptError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        rendered = render_script(segments, data.get('format', 'mp3'))
+    except SynthesisError as e:
+        logging.error(f"Script render failed: {e}")
+        return jsonify({'error': 'Audio generation failed. Please try again.'}), 500
+    except Exception as e:
+        logging.error(f"Script error: {e}")
+        return jsonify({'error': 'Audio generation failed. Please try again.'}), 500
+
+    for lang in {seg["lang"] for seg in segments}:
+        chars = sum(len(seg["text"]) for seg in segments if seg["lang"] == lang)
+        record_conversion(lang, "script", ", ".join(rendered["methods"]), chars, rendered["cached"])
+
+    result = {
+        "success": True,
+        "filename": f"voicepro_script_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{rendered['ext']}",
+        "segments": len(segments),
+        "voices_used": rendered["voices"],
+        "methods": rendered["methods"],
+        "format": rendered["format"],
+        "mimetype": rendered["mimetype"],
+        "cached": rendered["cached"],
+    }
+    if data.get('response_type', 'base64') == 'url':
+        result["audio_id"] = rendered["cache_key"]
+        result["audio_url"] = f"/audio/{rendered['cache_key']}"
+    else:
+        audio_base64 = base64.b64encode(rendered["audio"]).decode('utf-8')
+        result["audio_data"] = f"data:{rendered['mimetype']};base64,{audio_base64}"
+    return jsonify(result)
+
+
+@app.route('/convert/stream', methods=['GET', 'POST'])
+@limit_synthesis(cost=text_cost)
+def convert_stream():
+    """Chunked audio/mpeg response that starts playing while Edge is still synthesizing"""
+    text = request.values.get('text', '').strip()
+    lang = request.values.get('language', 'en-US')
+    voice_type = request.values.get('voice_type', 'female-1')
+    rate = request.values.get('rate', '1.0')
+    pitch = request.values.get('pitch', '0')
+    volume = request.values.get('volume', '100')
+
+    if not text:
+        return jsonify({'error': 'Please enter text to convert'}), 400
+
+    if len(text) > MAX_TEXT_CHARS:
+        return jsonify({'error': f'Text too long. Maximum {MAX_TEXT_CHARS} characters allowed.'}), 400
+
+    voice = get_voice(lang, voice_type)
+    rate_str = build_rate_str(rate)
+    pitch_str = build_pitch_str(pitch)
+    volume_str = build_volume_str(volume)
+    cache_key = audio_cache_key(text, voice, rate_str, pitch_str, volume_str)
+    headers = {"X-Voice-Used": voice, "Cache-Control": "no-store"}
+
+    cached = audio_cache.get(cache_key)
+    if cached:
+        record_conversion(lang, voice, cached[1].get("method", "Edge TTS"), len(text), True)
+        # A fallback engine may have cached something other than MP3 (pyttsx3 -> WAV)
+        mimetype = AUDIO_FORMATS[normalize_format(cached[1].get("format"))]["mimetype"]
+        return Response(cached[0], mimetype=mimetype, headers={**headers, "X-Audio-Cache": "HIT"})
+
+    edge = get_backend("edge")
+    if not edge.available or not edge.breaker.allow():
+        # Edge is missing or tripped: hand back a complete render from the fallback chain
+        try:
+            rendered = synthesize(text, lang, voice_type, rate, pitch, volume)
+        except SynthesisError:
+            return jsonify({'error': 'Audio generation failed. Please try again.'}), 500
+        record_conversion(lang, rendered["voice"], rendered["method"], len(text), rendered["cached"])
+        return Response(rendered["audio"], mimetype=rendered["mimetype"],
+                        headers={**headers, "X-Audio-Cache": "MISS", "X-TTS-Method": rendered["method"]})
+
+    started = time.perf_counter()
+    chunks = iter_edge_audio(text, voice, rate_str, pitch_str, volume_str)
+    try:
+        # Pull the first chunk before committing to a 200 so failures still get a JSON error
+        with trace_stage("first_byte", engine="edge", language=lang, voice=voice):
+            first = next(chunks)
+    except Exception as e:
+        edge.breaker.record_failure(str(e) or type(e).__name__)
+        logging.error(f"Edge TTS stream error: {e}")
+        return jsonify({'error': 'Audio generation failed. Please try again.'}), 500
+    # Time to first byte is what a streaming client waits on
+    edge.breaker.record_success(time.perf_counter() - started)
+
+    def generate():
+        audio = bytearray(first)
+        yield first
+        for chunk in chunks:
+            audio.extend(chunk)
+            yield chunk
+        # Only complete renders reach the cache
+        if len(audio) > 500:
+            audio_cache.put(cache_key, bytes(audio), {"method": "Edge TTS", "voice": voice, "format": "mp3"})
+            record_conversion(lang, voice, "Edge TTS", len(text), False, time.perf_counter() - started)
+
+    return Response(generate(), mimetype='audio/mpeg', headers={**headers, "X-Audio-Cache": "MISS"})
+
+
+@app.route('/audio/<audio_id>')
+def serve_audio(audio_id):
+    """Raw audio bytes for an ID returned by /convert (Range requests supported)"""
+    if not AUDIO_ID_RE.match(audio_id):
+        return jsonify({'error': 'Invalid audio id'}), 404
+
+    download_name = request.args.get('download')
+    meta = audio_cache.get_meta(audio_id)
+    mimetype = AUDIO_FORMATS[normalize_format(meta.get("format"))]["mimetype"]
+    path = audio_cache.get_path(audio_id)
+    if path:
+        return send_file(
+            path,
+            mimetype=mimetype,
+            conditional=True,
+            etag=audio_id,
+            as_attachment=bool(download_name),
+            download_name=download_name or None,
+            max_age=AUDIO_CACHE_TTL,
+        )
+
+    cached = audio_cache.get(audio_id)
+    if not cached:
+        return jsonify({'error': 'Audio expired. Please generate it again.'}), 404
+    resp = Response(cached[0], mimetype=mimetype)
+    resp.set_etag(audio_id)
+    resp.cache_control.max_age = AUDIO_CACHE_TTL
+    if download_name:
+        resp.headers['Content-Disposition'] = f'attachment; filename="{secure_filename(download_name)}"'
+    return resp.make_conditional(request, accept_ranges=True, complete_length=len(cached[0]))
+
+
+def job_items_cost():
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else None
+    return len(items) if isinstance(items, list) and items else 1
+
+
+@app.route('/jobs', methods=['POST'])
+@limit_synthesis(cost=job_items_cost, admit=False)
+def submit_job():
+    """Queue a batch of texts; poll /jobs/<id> and fetch /jobs/<id>/result.zip"""
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Provide a non-empty "items" list'}), 400
+    if len(items) > JOB_MAX_ITEMS:
+        return jsonify({'error': f'Too many items. Maximum {JOB_MAX_ITEMS} per job.'}), 400
+
+    cleaned = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            return jsonify({'error': f'Item {i} must be an object'}), 400
+        text = item.get('text')
+        if not isinstance(text, str) or not text.strip():
+            return jsonify({'error': f'Item {i} has no text'}), 400
+        text = text.strip()
+        if len(text) > MAX_TEXT_CHARS:
+            return jsonify({'error': f'Item {i} is too long. Maximum {MAX_TEXT_CHARS} characters allowed.'}), 400
+        for field in ('language', 'voice_type', 'format'):
+            if item.get(field) is not None and not isinstance(item[field], str):
+                return jsonify({'error': f'Item {i}: {field} must be a string'}), 400
+        for field in ('rate', 'pitch', 'volume'):
+            if item.get(field) is not None and not isinstance(item[field], (str, int, float)):
+                return jsonify({'error': f'Item {i}: {field} must be a number or string'}), 400
+        cleaned.append({**item, 'text': text})
+
+    job = job_queue.submit(cleaned)
+    return jsonify({
+        "success": True,
+        "job_id": job["id"],
+        "status": job["status"],
+        "total": job["total"],
+        "status_url": f"/jobs/{job['id']}",
+        "result_url": f"/jobs/{job['id']}/result.zip"
+    }), 202
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    for item in job["items"]:
+        if item.get("audio_id"):
+            item["audio_url"] = f"/audio/{item['audio_id']}"
+    return jsonify(job)
+
+
+@app.route('/jobs/<job_id>/result.zip')
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    done = [item for item in job["items"] if item["status"] == "done"]
+    if not done:
+        return jsonify({'error': 'No finished items yet', 'status': job["status"]}), 409
+
+    files = []
+    for item in done:
+        cached = audio_cache.get(item["audio_id"])
+        if not cached:
+            # Evicted, or rendered by another instance whose disk cache we can't see
+            item["status"] = "missing"
+            item["error"] = "Audio is no longer available on this server"
+            continue
+        # language/voice_type are client input: keep them out of the archive paths
+        stem = secure_filename(f"{item['language']}_{item['voice_type']}") or "audio"
+        ext = AUDIO_FORMATS[normalize_format(item.get("format"))]["ext"]
+        files.append((f"{item['index']:04d}_{stem}.{ext}", cached[0]))
+    if not files:
+        return jsonify({'error': 'Finished audio is no longer available. Please resubmit the job.',
+                        'status': job["status"]}), 409
+
+    archive = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_STORED) as zf:
+        for name, audio in files:
+            zf.writestr(name, audio)
+        zf.writestr("manifest.json", json.dumps(job, indent=2))
+    archive.seek(0)
+    return send_file(archive, mimetype='application/zip', as_attachment=True,
+                     download_name=f"voicepro_job_{job_id}.zip")
+
+
 @app.route('/preview-voice', methods=['POST'])
+@limit_synthesis()
 def preview_voice():
     try:
         data = request.get_json()
         lang = data.get('language', 'en-US')
         voice_type = data.get('voice_type', 'female-1')
-
-        text = SAMPLE_TEXTS.get(lang, "Hello! This is a preview of my voice.")
         voice = get_voice(lang, voice_type)
 
-        if not EDGE_AVAILABLE:
+        entry = preview_bank.get(lang, voice_type)
+        if not entry:
             return jsonify({"success": False, "error": "edge-tts not installed"})
 
-        filename = f"preview_{uuid.uuid4().hex}.mp3"
-        filepath = os.path.join(TEMP_FOLDER, filename)
-
-        async def gen():
-            await edge_tts.Communicate(text=text, voice=voice).save(filepath)
-
-        asyncio.run(gen())
-
-        if not os.path.exists(filepath) or os.path.getsize(filepath) < 500:
-            return jsonify({"success": False, "error": "Preview generation failed"})
-
-        with open(filepath, "rb") as f:
-            audio_b64 = base64.b64encode(f.read()).decode('utf-8')
-
-        try:
-            os.remove(filepath)
-        except:
-            pass
+        audio_b64 = base64.b64encode(entry[0]).decode('utf-8')
 
         return jsonify({
             "success": True,
             "audio_data": f"data:audio/mp3;base64,{audio_b64}",
+            "audio_url": f"/preview/{lang}/{voice_type}.mp3",
             "voice": voice,
             "language": lang
         })
@@ -538,19 +3141,125 @@ def preview_voice():
         return jsonify({"success": False, "error": str(e)})
 
 
+@app.route('/preview/<lang>/<voice_type>.mp3')
+def preview_audio(lang, voice_type):
+    """Serve a banked preview as static bytes with ETag/Cache-Control"""
+    entry = preview_bank.banked(lang, voice_type)
+    if entry:
+        # Already rendered: static bytes, so no rate-limit token or synthesis slot
+        return preview_audio_response(entry)
+    return render_preview_audio(lang, voice_type)
+
+
+@limit_synthesis()
+def render_preview_audio(lang, voice_type):
+    try:
+        entry = preview_bank.get(lang, voice_type)
+    except Exception as e:
+        logging.error(f"Preview error: {e}")
+        return jsonify({"success": False, "error": "Preview generation failed"}), 502
+    if not entry:
+        return jsonify({"success": False, "error": "edge-tts not installed"}), 503
+    return preview_audio_response(entry)
+
+
+def preview_audio_response(entry):
+    audio, etag = entry
+    resp = Response(audio, mimetype='audio/mpeg')
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = PREVIEW_MAX_AGE
+    return resp.make_conditional(request)
+
+
+def catalog_response(build_payload):
+    """JSON from the in-memory catalog, encoded once per URL and catalog version"""
+    body = metadata_bodies.get(
+        (request.full_path, voice_catalog.etag),
+        lambda: CompressedBody(jsonify(build_payload()).get_data(), "application/json"))
+    return body.response(METADATA_CACHE_CONTROL)
+
+
+@app.route('/api/voices')
+def list_catalog_voices():
+    """Every Edge voice, filterable by ?locale=, ?gender= and ?style="""
+    def build():
+        voices = voice_catalog.search(request.args.get('locale'), request.args.get('gender'), request.args.get('style'))
+        return {"source": voice_catalog.source, "count": len(voices), "voices": voices}
+    return catalog_response(build)
+
+
 @app.route('/api/voices/<lang>')
 def get_voices_for_lang(lang):
     """Return available voice types for a language"""
-    available = []
-    for vt in VOICE_TYPES:
-        voice = VOICE_MAPPING.get((lang, vt['id']))
-        if voice:
-            available.append({**vt, "edge_voice": voice})
-    return jsonify(available)
+    return catalog_response(lambda: voice_catalog.voice_types_for(lang))
+
+
+@app.route('/health/engines')
+def engine_health():
+    """Circuit-breaker state for every TTS backend, in routing order"""
+    return jsonify({"backends": [b.snapshot() for b in BACKENDS]})
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition: stage/request histograms, cache and breaker state"""
+    lines = STAGE_SECONDS.render() + REQUEST_SECONDS.render()
+    lines += [
+        "# HELP voicepro_startup_seconds Time to import app.py",
+        "# TYPE voicepro_startup_seconds gauge",
+        f"voicepro_startup_seconds {STARTUP_SECONDS:.6f}",
+        "# HELP voicepro_lazy_import_seconds Time spent importing each lazily loaded module",
+        "# TYPE voicepro_lazy_import_seconds gauge",
+    ]
+    lines += [f'voicepro_lazy_import_seconds{{module="{name}"}} {seconds:.6f}'
+              for name, seconds in sorted(LAZY_IMPORT_SECONDS.items())]
+
+    cache = audio_cache.stats()
+    lines += [
+        "# HELP voicepro_audio_cache_lookups_total Audio cache lookups by result",
+        "# TYPE voicepro_audio_cache_lookups_total counter",
+        f'voicepro_audio_cache_lookups_total{{result="memory_hit"}} {cache["memory_hits"]}',
+        f'voicepro_audio_cache_lookups_total{{result="disk_hit"}} {cache["disk_hits"]}',
+        f'voicepro_audio_cache_lookups_total{{result="miss"}} {cache["misses"]}',
+    ]
+    flight = synthesis_flight.stats()
+    lines += [
+        "# HELP voicepro_synthesis_coalesced_total Requests that joined an identical in-flight synthesis",
+        "# TYPE voicepro_synthesis_coalesced_total counter",
+        f"voicepro_synthesis_coalesced_total {flight['coalesced']}",
+    ]
+    load = admission.snapshot()
+    lines += [
+        "# HELP voicepro_synthesis_inflight Syntheses currently holding an admission slot",
+        "# TYPE voicepro_synthesis_inflight gauge",
+        f"voicepro_synthesis_inflight {load['inflight']}",
+        "# HELP voicepro_synthesis_waiting Requests queued for an admission slot",
+        "# TYPE voicepro_synthesis_waiting gauge",
+        f"voicepro_synthesis_waiting {load['waiting']}",
+        "# HELP voicepro_synthesis_rejected_total Requests turned away with 503",
+        "# TYPE voicepro_synthesis_rejected_total counter",
+        f"voicepro_synthesis_rejected_total {load['rejected']}",
+        "# HELP voicepro_backend_circuit_state 1 for the current breaker state of each backend",
+        "# TYPE voicepro_backend_circuit_state gauge",
+    ]
+    for backend in BACKENDS:
+        current = backend.breaker.state
+        for state in ("closed", "open", "half-open"):
+            lines.append(f'voicepro_backend_circuit_state{{backend="{backend.name}",state="{state}"}} {int(current == state)}')
+
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Hit/miss counters for the synthesized-audio cache"""
+    return jsonify(audio_cache.stats())
 
 
 @app.route('/test-redis')
 def test_redis():
+    redis = get_redis()
     if not redis:
         return jsonify({"status": "error", "message": "Redis not connected"})
     try:
@@ -563,8 +3272,61 @@ def test_redis():
 
 @app.route('/sitemap.xml')
 def sitemap():
-    return send_from_directory(app.root_path, 'sitemap.xml')
+    global _sitemap_body
+    if _sitemap_body is None:
+        path = os.path.join(app.root_path, 'sitemap.xml')
+        with open(path, 'rb') as f:
+            modified = datetime.fromtimestamp(int(os.path.getmtime(path)), tz=timezone.utc)
+            _sitemap_body = CompressedBody(f.read(), "application/xml", last_modified=modified)
+    return _sitemap_body.response(METADATA_CACHE_CONTROL)
+
+
+# ------------------ Production Server ------------------
+def drain(timeout=30):
+    """Flush buffered stats, then wait up to `timeout` for in-flight renders and batch items (worker shutdown)"""
+    # Flush first: the master may SIGKILL this worker before the wait below ends
+    stats_aggregator.flush()
+    usage_log.flush()
+    deadline = time.monotonic() + max(0.0, timeout)
+    while admission.snapshot()["inflight"] or job_queue.pending:
+        if time.monotonic() >= deadline:
+            logging.warning(f"Drain timed out: {admission.snapshot()['inflight']} renders, "
+                            f"{job_queue.pending} job items still running")
+            break
+        time.sleep(0.2)
+    else:
+        # Whatever finished while we waited
+        stats_aggregator.flush()
+        usage_log.flush()
+    logging.info(f"👋 Worker {os.getpid()} drained")
+
+
+def serve(argv):
+    """Production launcher: gunicorn with gunicorn.conf.py, e.g. python app.py serve --workers 4"""
+    import argparse
+    parser = argparse.ArgumentParser(prog="app.py serve", description="Run VoicePro under gunicorn")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--threads", type=int, help="request threads per worker (default: 8)")
+    parser.add_argument("--bind", help="address to listen on (default: 0.0.0.0:$PORT or 8000)")
+    parser.add_argument("--max-rss-mb", type=int, help="recycle a worker once its RSS exceeds this")
+    args = parser.parse_args(argv)
+
+    overrides = {"WEB_CONCURRENCY": args.workers, "GUNICORN_THREADS": args.threads,
+                 "GUNICORN_BIND": args.bind, "WORKER_MAX_RSS_MB": args.max_rss_mb}
+    for name, value in overrides.items():
+        if value is not None:
+            os.environ[name] = str(value)
+    config = os.path.join(app.root_path, "gunicorn.conf.py")
+    os.execvp(sys.executable, [sys.executable, "-m", "gunicorn", "--chdir", app.root_path,
+                               "-c", config, "app:app"])
+
+
+STARTUP_SECONDS = time.perf_counter() - IMPORT_STARTED
+logging.info(f"🚀 app.py imported in {STARTUP_SECONDS * 1000:.0f} ms (TTS engines and Redis load on first use)")
 
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    if sys.argv[1:2] == ["serve"]:
+        serve(sys.argv[2:])
+    else:
+        app.run(debug=True, port=5000)
@@ -0,0 +1,314 @@
+"""Offline load/latency benchmark for app.py.
+
+Runs the real Flask app against a fake edge-tts engine and a local stand-in
+for the Upstash REST API, so no request ever leaves the machine:
+
+    python benchmark.py --requests 2000 --concurrency 32 --tts-latency 0.3
+
+Reports p50/p95/p99 latency per endpoint, requests per second and peak RSS.
+Use --json to save the numbers and track regressions across releases.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# One silent MPEG-2 Layer III frame in Edge's output format (24 kHz, 48 kbps, mono)
+MP3_FRAME = b"\xff\xf3\x64\xc4" + b"\x00" * 140
+FRAMES_PER_CHAR = 3  # roughly Edge's audio length per character of speech
+
+
+# ------------------ Fake TTS Backend ------------------
+class FakeCommunicate:
+    """Drop-in for edge_tts.Communicate: deterministic MP3 frames after a fixed latency"""
+
+    latency = 0.2
+    chunk_frames = 40
+
+    def __init__(self, text, voice="en-US-AriaNeural", **kwargs):
+        self.text = text
+        self.voice = voice
+
+    def _frames(self):
+        return max(20, len(self.text) * FRAMES_PER_CHAR)
+
+    async def stream(self):
+        await asyncio.sleep(self.latency)
+        remaining = self._frames()
+        while remaining > 0:
+            count = min(self.chunk_frames, remaining)
+            remaining -= count
+            yield {"type": "audio", "data": MP3_FRAME * count}
+
+    async def save(self, audio_fname, metadata_fname=None):
+        with open(audio_fname, "wb") as f:
+            async for chunk in self.stream():
+                f.write(chunk["data"])
+
+
+# ------------------ Fake Upstash REST API ------------------
+class FakeUpstash:
+    """Just enough of the Upstash REST protocol (single, /pipeline, /multi-exec) for app.py"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.data = {}
+        self.zsets = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def execute(self, command):
+        name, args = command[0].upper(), command[1:]
+        if name == "PING":
+            return "PONG"
+        if name == "GET":
+            value = self.data.get(args[0])
+            return None if value is None else str(value)
+        if name == "MGET":
+            return [None if self.data.get(k) is None else str(self.data[k]) for k in args]
+        if name == "SET":
+            self.data[args[0]] = args[1]
+            return "OK"
+        if name in ("INCR", "INCRBY"):
+            amount = int(args[1]) if name == "INCRBY" else 1
+            self.data[args[0]] = int(self.data.get(args[0], 0)) + amount
+            return self.data[args[0]]
+        if name == "ZINCRBY":
+            zset = self.zsets.setdefault(args[0], {})
+            zset[args[2]] = zset.get(args[2], 0) + float(args[1])
+            return str(zset[args[2]])
+        if name == "EXPIRE":
+            return 1
+        raise ValueError(f"unsupported command {name}")
+
+    def handle(self, path, payload, encode):
+        if self.latency:
+            time.sleep(self.latency)
+
+        def result(command):
+            try:
+                with self._lock:
+                    value = self.execute(command)
+            except Exception as e:
+                return {"error": str(e)}
+            return {"result": self._encode(value) if encode else value}
+
+        with self._lock:
+            self.requests += 1
+        if path.rstrip("/").endswith(("pipeline", "multi-exec")):
+            return [result(command) for command in payload]
+        return result(payload)
+
+    def _encode(self, value):
+        if isinstance(value, str):
+            return value if value == "OK" else base64.b64encode(value.encode()).decode()
+        if isinstance(value, list):
+            return [self._encode(v) for v in value]
+        return value
+
+    def serve(self):
+        upstash = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"[]")
+                encode = self.headers.get("Upstash-Encoding") == "base64"
+                body = json.dumps(upstash.handle(self.path, payload, encode)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, name="fake-upstash", daemon=True).start()
+        return server
+
+
+# ------------------ Traffic Driver ------------------
+SAMPLE_SENTENCES = [
+    "Hello and welcome to our service.",
+    "Your order has shipped and will arrive on Thursday.",
+    "Thank you for calling, please hold while we connect you.",
+    "The meeting has been moved to three o'clock this afternoon.",
+    "Please remember to save your work before leaving.",
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def build_requests(args, languages, voice_types):
+    rng = random.Random(args.seed)
+    weights = {"convert": args.convert_weight, "preview": args.preview_weight, "stats": args.stats_weight}
+    kinds = [k for k, w in weights.items() for _ in range(w)]
+    plan = []
+    for i in range(args.requests):
+        kind = rng.choice(kinds)
+        lang = rng.choice(languages)
+        voice_type = rng.choice(voice_types)
+        if kind == "convert":
+            # unique_texts controls how often /convert can be answered from the audio cache
+            n = rng.randrange(args.unique_texts)
+            lang = languages[n % len(languages)]
+            voice_type = voice_types[(n // len(languages)) % len(voice_types)]
+            text = " ".join(SAMPLE_SENTENCES[(n + j) % len(SAMPLE_SENTENCES)] for j in range(args.sentences))
+            body = urllib.parse.urlencode({"text": f"{text} #{n}", "language": lang, "voice_type": voice_type,
+                                           "response_type": args.response_type}).encode()
+            plan.append(("convert", "/convert", body, "application/x-www-form-urlencoded"))
+        elif kind == "preview":
+            body = json.dumps({"language": lang, "voice_type": voice_type}).encode()
+            plan.append(("preview", "/preview-voice", body, "application/json"))
+        else:
+            plan.append(("stats", "/stats", None, None))
+    return plan
+
+
+def fire(base_url, item):
+    kind, path, body, content_type = item
+    req = urllib.request.Request(base_url + path, data=body)
+    if content_type:
+        req.add_header("Content-Type", content_type)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            resp.read()
+            ok = resp.status == 200
+    except Exception:
+        ok = False
+    return kind, time.perf_counter() - started, ok
+
+
+def run(args):
+    # Isolated TEMP_FOLDER so the audio cache and preview bank start cold
+    tempfile.tempdir = tempfile.mkdtemp(prefix="voicepro_bench_")
+
+    upstash = FakeUpstash(latency=args.redis_latency)
+    upstash_server = upstash.serve()
+    os.environ["KV_REST_API_URL"] = f"http://127.0.0.1:{upstash_server.server_port}"
+    os.environ["KV_REST_API_TOKEN"] = "benchmark"
+    os.environ.setdefault("PREVIEW_WARM_ON_STARTUP", "1" if args.warm_previews else "0")
+    os.environ.setdefault("VOICE_CATALOG_REFRESH_ON_STARTUP", "0")
+    # All traffic comes from one address; measure the pipeline, not the per-client limiter
+    os.environ.setdefault("RATE_LIMIT_BURST", "1000000")
+    os.environ.setdefault("MAX_SYNTHESIS_QUEUE", str(max(16, args.concurrency)))
+
+    import edge_tts
+    FakeCommunicate.latency = args.tts_latency
+    edge_tts.Communicate = FakeCommunicate
+
+    import app as voice_app
+    from werkzeug.serving import make_server
+
+    # Keep every request on the (fake) Edge path; the real fallbacks would go to the network
+    voice_app.BACKENDS[:] = [b for b in voice_app.BACKENDS if b.name == "edge"]
+    voice_app.app.logger.disabled = True
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    server = make_server("127.0.0.1", 0, voice_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    plan = build_requests(args, [l["code"] for l in voice_app.LANGUAGES], [v["id"] for v in voice_app.VOICE_TYPES])
+    for item in plan[:args.warmup]:
+        fire(base_url, item)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda item: fire(base_url, item), plan))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "elapsed_s": round(elapsed, 3),
+        "requests": len(results),
+        "errors": sum(1 for _, _, ok in results if not ok),
+        "rps": round(len(results) / elapsed, 1) if elapsed else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "upstash_requests": upstash.requests,
+        "endpoints": {},
+    }
+    for kind in ("all", "convert", "preview", "stats"):
+        latencies = sorted(t for k, t, _ in results if kind == "all" or k == kind)
+        if not latencies:
+            continue
+        report["endpoints"][kind] = {
+            "count": len(latencies),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(latencies[-1] * 1000, 1),
+        }
+    if hasattr(voice_app, "audio_cache"):
+        report["audio_cache"] = voice_app.audio_cache.stats()
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['requests']} requests in {report['elapsed_s']}s "
+          f"-> {report['rps']} req/s, {report['errors']} errors, peak RSS {report['peak_rss_mb']} MB")
+    print(f"{'endpoint':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind, row in report["endpoints"].items():
+        print(f"{kind:<10}{row['count']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+    print(f"Upstash round trips: {report['upstash_requests']}")
+    if "audio_cache" in report:
+        cache = report["audio_cache"]
+        print(f"Audio cache: {cache['hits']} hits / {cache['misses']} misses")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load/latency benchmark for the VoicePro app")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="requests sent before timing starts")
+    parser.add_argument("--tts-latency", type=float, default=0.2, help="fake engine latency (seconds)")
+    parser.add_argument("--redis-latency", type=float, default=0.01, help="fake Upstash latency (seconds)")
+    parser.add_argument("--unique-texts", type=int, default=50, help="distinct /convert texts (lower = more cache hits)")
+    parser.add_argument("--sentences", type=int, default=3, help="sentences per /convert text")
+    parser.add_argument("--response-type", choices=["base64", "url"], default="base64")
+    parser.add_argument("--convert-weight", type=int, default=6)
+    parser.add_argument("--preview-weight", type=int, default=2)
+    parser.add_argument("--stats-weight", type=int, default=2)
+    parser.add_argument("--warm-previews", action="store_true", help="warm the preview bank at startup")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Gunicorn settings for running app.py across several worker processes.
+
+    python app.py serve --workers 4            # or: gunicorn -c gunicorn.conf.py app:app
+
+Workers are threaded (synthesis is I/O-bound and runs on each worker's asyncio loop thread),
+share the on-disk audio cache, preview bank and voice catalog under the system temp folder,
+drain in-flight renders on reload/shutdown and are recycled once they grow past WORKER_MAX_RSS_MB.
+"""
+import logging
+import multiprocessing
+import os
+import resource
+import signal
+import sys
+import time
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Long texts render for a while; a reload (HUP) or stop (TERM) lets in-flight requests finish
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "60"))
+keepalive = 5
+
+# Recycle workers after a request count as a backstop to the memory check below
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = max_requests // 10
+
+# Each worker imports the app itself, so no threads or sockets are inherited across fork
+preload_app = False
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+
+WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", "512"))
+
+
+def current_rss_mb():
+    """Resident set size right now (Linux), else the peak reported by getrusage"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _mark_stopping(worker):
+    # The master SIGKILLs a worker graceful_timeout after asking it to stop; remember when that was
+    if getattr(worker, "stop_requested_at", None) is None:
+        worker.stop_requested_at = time.monotonic()
+
+
+def post_worker_init(worker):
+    handle_exit = worker.handle_exit
+
+    def on_term(sig, frame):
+        _mark_stopping(worker)
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, on_term)
+
+
+def post_request(worker, req, environ, resp):
+    if not WORKER_MAX_RSS_MB or not worker.alive:
+        return
+    rss = current_rss_mb()
+    if rss > WORKER_MAX_RSS_MB:
+        # Stop accepting; in-flight requests finish, then the master forks a fresh worker
+        worker.log.info(f"Worker {worker.pid} at {rss:.0f} MB RSS (limit {WORKER_MAX_RSS_MB} MB), recycling")
+        _mark_stopping(worker)
+        worker.alive = False
+
+
+def worker_exit(server, worker):
+    # Runs in the worker after it stops serving: let batch jobs finish and flush buffered stats
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        stopped_at = getattr(worker, "stop_requested_at", None) or time.monotonic()
+        remaining = graceful_timeout - (time.monotonic() - stopped_at) - 1  # margin before SIGKILL
+        try:
+            app_module.drain(remaining)
+        except Exception as e:
+            logging.error(f"Worker {worker.pid} drain failed: {e}")